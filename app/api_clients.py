@@ -1,52 +1,188 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional
+
 import requests
 from loguru import logger
+from requests.adapters import HTTPAdapter
+
+from app.config import WEATHER_API_URL, NEWS_API_URL, get_settings
+from app.shared_store import get_store
+
+# Максимальное число параллельных запросов в пакетных функциях
+BATCH_MAX_WORKERS = 8
+# Начало строки с курсом USD к RUB в ответе get_dollar_rate
+DOLLAR_RATE_PREFIX = "Курс доллара:"
+
+
+@lru_cache(maxsize=1)
+def get_http_session() -> requests.Session:
+    """
+    Возвращает общую HTTP-сессию с пулом соединений для пакетных запросов.
+
+    :return: Объект requests.Session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=BATCH_MAX_WORKERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def unique(items: Iterable[str]) -> List[str]:
+    """
+    Удаляет повторы (без учёта регистра и пробелов по краям), сохраняя порядок.
+
+    :param items: Исходные строки.
+    :return: Список уникальных строк.
+    """
+    seen = set()
+    result: List[str] = []
+    for item in items:
+        key = item.strip().casefold()
+        if key and key not in seen:
+            seen.add(key)
+            result.append(item.strip())
+    return result
 
-from app.config import (
-    WEATHER_API_URL,
-    WEATHER_API_KEY,
-    DOLLAR_API_URL,
-    NEWS_API_URL,
-    NEWS_API_KEY,
-)
+
+def cache_get(namespace: str, key: str) -> Optional[Any]:
+    """
+    Возвращает результат инструмента из кэша (общего для воркеров, если он настроен).
+
+    Кэш необязателен: ошибка хранилища (например, занятая база SQLite)
+    записывается в лог и считается промахом.
+
+    :param namespace: Пространство имён кэша (имя инструмента).
+    :param key: Аргумент инструмента.
+    :return: Закэшированное значение или None.
+    """
+    if get_settings().tool_cache_ttl <= 0:
+        return None
+    try:
+        return get_store().get(namespace, key.strip().casefold())
+    except Exception as e:
+        logger.warning("Ошибка чтения кэша {}: {}", namespace, e)
+        return None
 
 
-def get_weather(location: str) -> str:
+def cache_set(namespace: str, key: str, value: Any) -> None:
+    """
+    Сохраняет успешный результат инструмента в кэш на ``TOOL_CACHE_TTL`` секунд.
+
+    Ошибка хранилища записывается в лог и не влияет на результат инструмента.
+
+    :param namespace: Пространство имён кэша (имя инструмента).
+    :param key: Аргумент инструмента.
+    :param value: Результат инструмента.
+    """
+    ttl = get_settings().tool_cache_ttl
+    if ttl <= 0:
+        return
+    try:
+        get_store().set(namespace, key.strip().casefold(), value, ttl)
+    except Exception as e:
+        logger.warning("Ошибка записи в кэш {}: {}", namespace, e)
+
+
+def get_weather(location: str, http: Optional[Any] = None) -> str:
     """
     Получает текущую погоду для указанного местоположения.
 
     :param location: Название местоположения (город).
+    :param http: HTTP-клиент с методом get (по умолчанию модуль requests).
     :return: Строка с описанием погоды и температурой.
     """
+    cached = cache_get("weather", location)
+    if cached is not None:
+        return cached
     try:
-        params = {"q": location, "appid": WEATHER_API_KEY, "units": "metric"}
-        response = requests.get(WEATHER_API_URL, params=params)
+        params = {
+            "q": location,
+            "appid": get_settings().weather_api_key,
+            "units": "metric",
+        }
+        response = (http or requests).get(WEATHER_API_URL, params=params)
         response.raise_for_status()
         data = response.json()
         desc: str = data.get("weather", [{}])[0].get("description", "нет данных")
         temp: Union[float, str] = data.get("main", {}).get("temp", "нет данных")
-        return f"Погода в {location}: {desc}, температура {temp}°C"
+        result = f"Погода в {location}: {desc}, температура {temp}°C"
+        cache_set("weather", location, result)
+        return result
     except Exception as e:
-        logger.error("Ошибка получения погоды: {}", e)
-        return "Ошибка получения данных о погоде."
+        logger.error("Ошибка получения погоды в {}: {}", location, e)
+        return f"Ошибка получения данных о погоде в {location}."
+
+
+def get_weather_batch(locations: List[str]) -> str:
+    """
+    Получает погоду сразу для нескольких местоположений параллельно.
+
+    Повторяющиеся местоположения запрашиваются один раз.
+
+    :param locations: Список местоположений (городов).
+    :return: Строка с погодой по каждому местоположению, по одному на строку.
+    """
+    locations = unique(locations)
+    if not locations:
+        return "Не указано ни одного местоположения."
+    session = get_http_session()
+    with ThreadPoolExecutor(max_workers=min(len(locations), BATCH_MAX_WORKERS)) as pool:
+        results = pool.map(lambda location: get_weather(location, session), locations)
+        return "\n".join(results)
 
 
 def get_dollar_rate() -> str:
     """
     Получает текущий курс доллара.
 
+    Первая строка ответа содержит курс USD к RUB, вторая - курсы ко всем валютам.
+
     :return: Строка с информацией о курсе обмена USD к RUB.
     """
+    cached = cache_get("dollar_rate", "USD")
+    if cached is not None:
+        return cached
     try:
-        response = requests.get(DOLLAR_API_URL)
+        response = requests.get(get_settings().dollar_api_url)
         response.raise_for_status()
         data = response.json()
         rates = data.get("conversion_rates", {})
-        return f"Курсы: {rates}" if rates else "Данные о курсе недоступны."
+        if not rates:
+            return "Данные о курсе недоступны."
+        result = f"Курсы: {rates}"
+        if "RUB" in rates:
+            result = f"{DOLLAR_RATE_PREFIX} 1 USD = {rates['RUB']} RUB\n{result}"
+        cache_set("dollar_rate", "USD", result)
+        return result
     except Exception as e:
         logger.error("Ошибка получения курса доллара: {}", e)
         return "Ошибка получения курса доллара."
 
 
+def fetch_headlines(query: str, http: Optional[Any] = None) -> List[str]:
+    """
+    Запрашивает заголовки новостей за последнюю неделю по указанной теме.
+
+    :param query: Тема новостей.
+    :param http: HTTP-клиент с методом get (по умолчанию модуль requests).
+    :return: Список заголовков.
+    """
+    cached = cache_get("news", query)
+    if cached is not None:
+        return cached
+    params = {"q": query, "apiKey": get_settings().news_api_key, "pageSize": 5}
+    response = (http or requests).get(NEWS_API_URL, params=params)
+    response.raise_for_status()
+    data = response.json()
+    articles = data.get("articles", [])
+    headlines = [article.get("title", "Без заголовка") for article in articles]
+    if headlines:
+        cache_set("news", query, headlines)
+    return headlines
+
+
 def get_weekly_news(query: str = "Новости") -> str:
     """
     Получает новости за последнюю неделю по указанной теме.
@@ -55,16 +191,46 @@ def get_weekly_news(query: str = "Новости") -> str:
     :return: Строка с последними новостными заголовками.
     """
     try:
-        params = {"q": query, "apiKey": NEWS_API_KEY, "pageSize": 5}
-        response = requests.get(NEWS_API_URL, params=params)
-        response.raise_for_status()
-        data = response.json()
-        articles = data.get("articles", [])
-        if articles:
-            headlines = [article.get("title", "Без заголовка") for article in articles]
+        headlines = fetch_headlines(query)
+        if headlines:
             return "Последние новости: " + "; ".join(headlines)
         else:
             return "Новостные данные недоступны."
     except Exception as e:
         logger.error("Ошибка получения новостей: {}", e)
         return "Ошибка получения новостей."
+
+
+def get_weekly_news_batch(queries: List[str]) -> str:
+    """
+    Получает новости сразу по нескольким темам параллельно.
+
+    Повторяющиеся темы запрашиваются один раз, а заголовок, найденный
+    по нескольким темам, выводится только для первой из них.
+
+    :param queries: Список тем новостей.
+    :return: Строка с заголовками по каждой теме, по одной теме на строку.
+    """
+    queries = unique(queries) or ["Новости"]
+    session = get_http_session()
+
+    def fetch(query: str) -> Optional[List[str]]:
+        try:
+            return fetch_headlines(query, session)
+        except Exception as e:
+            logger.error("Ошибка получения новостей по теме {}: {}", query, e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(len(queries), BATCH_MAX_WORKERS)) as pool:
+        results = list(pool.map(fetch, queries))
+
+    seen = set()
+    lines: List[str] = []
+    for query, headlines in zip(queries, results):
+        if headlines is None:
+            lines.append(f"{query}: ошибка получения новостей.")
+            continue
+        fresh = [title for title in headlines if title not in seen]
+        seen.update(fresh)
+        lines.append(f"{query}: " + ("; ".join(fresh) if fresh else "нет новых новостей."))
+    return "\n".join(lines)
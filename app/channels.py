@@ -0,0 +1,55 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import Any, Optional
+
+from app.protocol import ENCODING_JSON
+
+
+class NullChannel:
+    """
+    Канал вывода без клиента: кадры стриминга отбрасываются.
+
+    Используется вместо WebSocket там, где нужен только итоговый ответ (пакетная обработка).
+    """
+
+    def __init__(self, client: Any = None) -> None:
+        self.client = client
+        self.state = SimpleNamespace(frame_encoding=ENCODING_JSON)
+
+    async def send_text(self, text: str) -> None:
+        pass
+
+    async def send_bytes(self, data: bytes) -> None:
+        pass
+
+
+class SSEChannel(NullChannel):
+    """
+    Канал вывода, превращающий кадры стриминга в события Server-Sent Events.
+
+    Кадры складываются в очередь, из которой их читает генератор HTTP-ответа.
+    """
+
+    def __init__(self, client: Any = None) -> None:
+        super().__init__(client)
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+    async def send_text(self, text: str) -> None:
+        await self.queue.put(f"data: {text}\n\n")
+
+    async def send_event(self, event: str, data: Any) -> None:
+        """
+        Отправляет именованное событие SSE.
+
+        :param event: Название события.
+        :param data: Данные события (сериализуются в JSON).
+        """
+        payload = json.dumps(data, ensure_ascii=False)
+        await self.queue.put(f"event: {event}\ndata: {payload}\n\n")
+
+    async def close(self) -> None:
+        """
+        Завершает поток событий.
+        """
+        await self.queue.put(None)
@@ -1,13 +1,29 @@
 import json
 import asyncio
-import os
-from typing import Any, Dict, List
+import hashlib
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
 from loguru import logger
 from openai import AsyncOpenAI
 
-from app.api_clients import get_weather, get_dollar_rate, get_weekly_news
-from app.config import ASSISTANT
+from app.api_clients import get_weather_batch, get_dollar_rate, get_weekly_news_batch
+from app.config import ASSISTANT, get_settings
+from app.metrics import route_stats, usage_stats
+from app.protocol import (
+    FRAME_DELTA,
+    FRAME_DONE,
+    FRAME_START,
+    FRAME_TOOL,
+    TOOL_FAILED,
+    TOOL_FINISHED,
+    TOOL_STARTED,
+    new_message_id,
+    send_frame,
+)
+from app.routing import ROUTE_DISPATCH, ROUTE_TEMPLATE, get_model_router
+from app.tool_templates import TOOL_TEMPLATES
 from openai.types.chat.chat_completion_message import ChatCompletionMessage
 from openai.types.chat.chat_completion_tool_message_param import (
     ChatCompletionToolMessageParam,
@@ -17,7 +33,26 @@ from openai.types.chat.chat_completion_message_tool_call import (
 )
 
 
-openai = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+@lru_cache(maxsize=1)
+def get_openai_client() -> AsyncOpenAI:
+    """
+    Возвращает клиент OpenAI, создавая его при первом обращении.
+
+    Клиент создаётся в каждом воркере после fork (при старте приложения или
+    первом запросе), а не при импорте модуля.
+
+    :return: Асинхронный клиент OpenAI.
+    """
+    return AsyncOpenAI(api_key=get_settings().openai_api_key)
+
+
+async def close_openai_client() -> None:
+    """
+    Закрывает клиент OpenAI, если он был создан.
+    """
+    if get_openai_client.cache_info().currsize:
+        await get_openai_client().close()
+        get_openai_client.cache_clear()
 
 
 # Инструменты для ChatGPT 😊
@@ -26,16 +61,20 @@ tools: List[Dict[str, Any]] = [
         "type": "function",
         "function": {
             "name": "get_weather",
-            "description": "Получить текущую температуру для указанного местоположения.",
+            "description": (
+                "Получить текущую температуру для одного или нескольких местоположений. "
+                "Передавай все местоположения в одном вызове."
+            ),
             "parameters": {
                 "type": "object",
                 "properties": {
-                    "location": {
-                        "type": "string",
-                        "description": "Город и страна, например: Bogotá, Colombia (на английском)",
+                    "locations": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Города и страны, например: Bogotá, Colombia (на английском)",
                     }
                 },
-                "required": ["location"],
+                "required": ["locations"],
                 "additionalProperties": False,
             },
             "strict": True,
@@ -59,13 +98,20 @@ tools: List[Dict[str, Any]] = [
         "type": "function",
         "function": {
             "name": "get_weekly_news",
-            "description": "Получить последние новости за неделю по указанной теме.",
+            "description": (
+                "Получить последние новости за неделю по одной или нескольким темам. "
+                "Передавай все темы в одном вызове."
+            ),
             "parameters": {
                 "type": "object",
                 "properties": {
-                    "query": {"type": "string", "description": "Тема новостей"}
+                    "queries": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Темы новостей",
+                    }
                 },
-                "required": ["query"],
+                "required": ["queries"],
                 "additionalProperties": False,
             },
             "strict": True,
@@ -74,6 +120,44 @@ tools: List[Dict[str, Any]] = [
 ]
 
 
+def build_request(history: List[Any], model: str) -> Dict[str, Any]:
+    """
+    Собирает параметры запроса к ChatGPT с побайтово стабильным префиксом.
+
+    Системное сообщение и схема инструментов - общие неизменяемые объекты,
+    поэтому начало запроса совпадает между ходами и сессиями и попадает в кэш промптов.
+
+    :param history: История сообщений.
+    :param model: Название модели.
+    :return: Словарь параметров для chat.completions.create.
+    """
+    return {
+        "model": model,
+        "messages": history,
+        "tools": tools,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+
+
+def prefix_fingerprint(request: Dict[str, Any]) -> str:
+    """
+    Вычисляет отпечаток префикса запроса: системного сообщения и инструментов,
+    переданных в chat.completions.create.
+
+    Если отпечаток меняется между запросами, их префиксы не совпадут в кэше промптов.
+
+    :param request: Параметры запроса, собранные build_request.
+    :return: Первые 12 символов SHA-256 от префикса.
+    """
+    messages = request["messages"]
+    prefix = [messages[0] if messages else None, request["tools"]]
+    serialized = json.dumps(
+        prefix, ensure_ascii=False, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:12]
+
+
 async def process_tool_calls(
     message: ChatCompletionMessage, websocket: Any, connection_manager: Any
 ) -> List[ChatCompletionToolMessageParam]:
@@ -87,11 +171,17 @@ async def process_tool_calls(
     """
     responses: List[ChatCompletionToolMessageParam] = []
 
-    # Словарь, связывающий имя функции с её реализацией
+    # Словарь, связывающий имя функции с её реализацией.
+    # Одиночные аргументы (location, query) поддерживаются для совместимости,
+    # пустые списки обрабатываются самими пакетными функциями
     tool_functions = {
-        "get_weather": lambda args: get_weather(args.get("location", "None")),
+        "get_weather": lambda args: get_weather_batch(
+            args.get("locations") or ([args["location"]] if "location" in args else [])
+        ),
         "get_dollar_rate": lambda _: get_dollar_rate(),
-        "get_weekly_news": lambda args: get_weekly_news(args.get("query", "None")),
+        "get_weekly_news": lambda args: get_weekly_news_batch(
+            args.get("queries") or ([args["query"]] if "query" in args else [])
+        ),
     }
 
     if message.tool_calls:
@@ -101,6 +191,9 @@ async def process_tool_calls(
         async def call_tool(tool_call) -> ChatCompletionToolMessageParam:
             func_name = tool_call.function.name
             logger.info("Вызов функции: {}", func_name)
+            await send_frame(
+                websocket, FRAME_TOOL, tool_call.id, name=func_name, status=TOOL_STARTED
+            )
 
             # Преобразование аргументов в словарь
             try:
@@ -111,9 +204,11 @@ async def process_tool_calls(
 
             # Найдем функцию по имени
             function_to_call = tool_functions.get(func_name)
+            status = TOOL_FINISHED
             if function_to_call is None:
                 result = f"Функция {func_name} не найдена."
                 logger.error(result)
+                status = TOOL_FAILED
             else:
                 # Выполняем функцию в отдельном потоке, чтобы не блокировать event loop
                 result = await asyncio.to_thread(function_to_call, arguments)
@@ -123,6 +218,9 @@ async def process_tool_calls(
                 content=str(result), role="tool", tool_call_id=tool_call.id
             )
             connection_manager.add_message(websocket, tool_response)
+            await send_frame(
+                websocket, FRAME_TOOL, tool_call.id, name=func_name, status=status
+            )
             return tool_response
 
         # Создаем задачи (tasks) для всех вызовов инструментов
@@ -136,27 +234,57 @@ async def process_tool_calls(
 async def create_stream_message(
     history: List[Any],
     websocket: Any,
+    route: str = ROUTE_DISPATCH,
 ) -> ChatCompletionMessage:
     """
     Создает потоковое сообщение для ChatGPT с отправкой частичных результатов через WebSocket.
 
+    Клиенту отправляются JSON-кадры: ``start`` в начале ответа, ``delta`` для каждого
+    текстового чанка (с порядковым номером ``seq``) и ``done`` по завершении.
+
+    Модель выбирается политикой маршрутизации по маршруту вызова и длине истории.
+
     :param history: История сообщений для передачи в модель.
     :param websocket: Объект WebSocket для отправки данных клиенту.
+    :param route: Маршрут вызова (dispatch - первый вызов, answer - после инструментов).
     :return: Финальное сообщение ассистента.
     """
-    stream = await openai.chat.completions.create(
-        model="gpt-4o",
-        messages=history,
-        tools=tools,
-        stream=True,
-    )
+    model: str = get_model_router().select_model(route, history)
+    started: float = time.perf_counter()
+    request: Dict[str, Any] = build_request(history, model)
+    stream = await get_openai_client().chat.completions.create(**request)
 
     assistant_text: str = ""
     final_tool_calls: Dict[int, Any] = {}
+    message_id: str = new_message_id()
+    seq: int = 0
+    first_token_latency: Optional[float] = None
+    final_usage: Any = None
+
+    await send_frame(websocket, FRAME_START, message_id)
 
     async for chunk in stream:
+        # Последний чанк содержит только статистику использования токенов
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            final_usage = usage
+            cached_tokens = usage_stats.record(usage)
+            logger.info(
+                "Токены: промпт {}, из кэша {}, ответ {} (префикс {})",
+                usage.prompt_tokens,
+                cached_tokens,
+                usage.completion_tokens,
+                prefix_fingerprint(request),
+            )
+        if not chunk.choices:
+            continue
+
+        delta = chunk.choices[0].delta
+        if first_token_latency is None and (delta.content or delta.tool_calls):
+            first_token_latency = time.perf_counter() - started
+
         # Сбор данных по вызовам инструментов
-        for tool_call in chunk.choices[0].delta.tool_calls or []:
+        for tool_call in delta.tool_calls or []:
             index: int = tool_call.index
             if index not in final_tool_calls:
                 final_tool_calls[index] = tool_call
@@ -166,11 +294,14 @@ async def create_stream_message(
                 ].function.arguments += tool_call.function.arguments
 
         # Обработка текстового контента
-        if chunk.choices[0].delta.content is not None:
-            text_chunk: str = chunk.choices[0].delta.content
+        if delta.content:
+            text_chunk: str = delta.content
             assistant_text += text_chunk
             # Отправляем каждую часть через WebSocket клиенту
-            await websocket.send_text(text_chunk)
+            await send_frame(
+                websocket, FRAME_DELTA, message_id, seq=seq, delta=text_chunk
+            )
+            seq += 1
 
     # Превращаем каждый tool_call в ChatCompletionMessageToolCall
     final_tool_call_objs: List[ChatCompletionMessageToolCall] = [
@@ -181,6 +312,14 @@ async def create_stream_message(
     logger.success(assistant_text)
     logger.warning(final_tool_call_objs)
 
+    await send_frame(
+        websocket, FRAME_DONE, message_id, tool_calls=bool(final_tool_call_objs)
+    )
+
+    latency: float = time.perf_counter() - started
+    route_stats.record(route, model, latency, first_token_latency, final_usage)
+    logger.info("Маршрут {} ({}): {:.3f} с", route, model, latency)
+
     assistant_message = ChatCompletionMessage(
         role=ASSISTANT,
         content=assistant_text,
@@ -188,3 +327,33 @@ async def create_stream_message(
     )
 
     return assistant_message
+
+
+async def create_templated_message(
+    tool_calls: List[ChatCompletionMessageToolCall],
+    tool_responses: List[ChatCompletionToolMessageParam],
+    websocket: Any,
+) -> ChatCompletionMessage:
+    """
+    Формирует ответ ассистента по шаблонам инструментов без вызова модели.
+
+    Ответ отправляется клиенту теми же кадрами start, delta и done, что и потоковый.
+
+    :param tool_calls: Вызовы инструментов из сообщения ассистента.
+    :param tool_responses: Ответные сообщения инструментов в том же порядке.
+    :param websocket: Объект WebSocket для отправки данных клиенту.
+    :return: Финальное сообщение ассистента.
+    """
+    started: float = time.perf_counter()
+    assistant_text: str = "\n".join(
+        TOOL_TEMPLATES[tool_call.function.name](str(response["content"]))
+        for tool_call, response in zip(tool_calls, tool_responses)
+    )
+    message_id: str = new_message_id()
+
+    await send_frame(websocket, FRAME_START, message_id)
+    await send_frame(websocket, FRAME_DELTA, message_id, seq=0, delta=assistant_text)
+    await send_frame(websocket, FRAME_DONE, message_id, tool_calls=False)
+
+    route_stats.record(ROUTE_TEMPLATE, ROUTE_TEMPLATE, time.perf_counter() - started)
+    return ChatCompletionMessage(role=ASSISTANT, content=assistant_text)
@@ -1,23 +1,159 @@
 import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Mapping, Optional, Tuple
 
 from dotenv import load_dotenv
 
 dotenv_path = os.path.join(os.path.dirname(__file__), "..", ".env")
-load_dotenv(dotenv_path)
-
-DOLLAR_API_KEY = os.getenv("DOLLAR_API_KEY")
-WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
-NEWS_API_KEY = os.getenv("NEWS_API_KEY")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-if not all([DOLLAR_API_KEY, WEATHER_API_KEY, NEWS_API_KEY, OPENAI_API_KEY]):
-    raise ValueError("Один или несколько API ключей не найдены в переменных окружения.")
 
 WEATHER_API_URL = "https://api.openweathermap.org/data/2.5/weather"
-DOLLAR_API_URL = f"https://v6.exchangerate-api.com/v6/{DOLLAR_API_KEY}/latest/USD"
+DOLLAR_API_URL_TEMPLATE = "https://v6.exchangerate-api.com/v6/{key}/latest/USD"
 NEWS_API_URL = "https://newsapi.org/v2/everything"
 
+# Системный промпт. Он общий для всех сессий и не должен меняться между запросами,
+# чтобы префикс запроса (системный промпт + инструменты) попадал в кэш промптов
+SYSTEM_PROMPT = (
+    "Используй смайлики, когда они уместны 😊, "
+    "а также для структурирования текста. Пиши структурированно и по делу, "
+    "минимизируй количество воды. В своих ответах используй Markdown, "
+    "также код оборачивай в ```язык\n<код>\n```."
+)
+
 # Роли сообщений
 USER = "user"
 ASSISTANT = "assistant"
 TOOL = "tool"
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Настройки приложения из переменных окружения.
+    """
+
+    dollar_api_key: str = ""
+    weather_api_key: str = ""
+    news_api_key: str = ""
+    openai_api_key: str = ""
+
+    # Кодировка кадров стриминга по умолчанию (json или msgpack).
+    # Клиент может переопределить её параметром ?encoding= у /api/chat/
+    ws_frame_encoding: str = "json"
+
+    # Маршрутизация моделей: модель для первого вызова (выбор инструментов),
+    # модель для ответа после инструментов и модель для длинных историй
+    dispatch_model: str = "gpt-4o"
+    answer_model: str = "gpt-4o"
+    long_history_model: str = ""
+    long_history_threshold: int = 40
+    # Инструменты, результат которых отправляется пользователю по шаблону
+    # без второго вызова модели
+    templated_tools: Tuple[str, ...] = ()
+
+    # Heartbeat и время жизни сессий (в секундах): интервал ping-кадров, время без
+    # сообщений от клиента, после которого соединение считается оборванным, и простой
+    # без сообщений пользователя, после которого сессия закрывается
+    heartbeat_interval: float = 20.0
+    heartbeat_timeout: float = 60.0
+    idle_timeout: float = 1800.0
+    # Общий бюджет памяти на истории всех сессий (в байтах) и каталог для выгрузки
+    # вытесненных историй на диск (если не задан, вытесненные истории удаляются).
+    # Выгрузка и чтение выполняются синхронно в event loop, поэтому каталог должен
+    # находиться на быстром локальном диске (не на сетевой файловой системе)
+    session_memory_budget: int = 64 * 1024 * 1024
+    session_spill_dir: str = ""
+
+    # Число промптов, обрабатываемых одновременно в пакетном API по умолчанию
+    batch_concurrency: int = 4
+
+    # Путь к базе SQLite, общей для всех воркеров (кэш инструментов и сессии).
+    # Если не задан, кэш хранится в памяти процесса, а сессии не сохраняются
+    shared_store_path: str = ""
+    # Время жизни результатов инструментов в кэше (в секундах, 0 - без кэша)
+    tool_cache_ttl: float = 300.0
+
+    @property
+    def dollar_api_url(self) -> str:
+        """
+        URL API курса доллара с ключом доступа.
+        """
+        return DOLLAR_API_URL_TEMPLATE.format(key=self.dollar_api_key)
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "Settings":
+        """
+        Создает настройки из переменных окружения.
+
+        :param environ: Переменные окружения (по умолчанию os.environ).
+        :return: Объект настроек.
+        """
+        env = os.environ if environ is None else environ
+        defaults = cls()
+        return cls(
+            dollar_api_key=env.get("DOLLAR_API_KEY", ""),
+            weather_api_key=env.get("WEATHER_API_KEY", ""),
+            news_api_key=env.get("NEWS_API_KEY", ""),
+            openai_api_key=env.get("OPENAI_API_KEY", ""),
+            ws_frame_encoding=env.get("WS_FRAME_ENCODING", defaults.ws_frame_encoding),
+            dispatch_model=env.get("DISPATCH_MODEL", defaults.dispatch_model),
+            answer_model=env.get("ANSWER_MODEL", defaults.answer_model),
+            long_history_model=env.get(
+                "LONG_HISTORY_MODEL", defaults.long_history_model
+            ),
+            long_history_threshold=int(
+                env.get("LONG_HISTORY_THRESHOLD", defaults.long_history_threshold)
+            ),
+            templated_tools=tuple(
+                name.strip()
+                for name in env.get("TEMPLATED_TOOLS", "").split(",")
+                if name.strip()
+            ),
+            heartbeat_interval=float(
+                env.get("HEARTBEAT_INTERVAL", defaults.heartbeat_interval)
+            ),
+            heartbeat_timeout=float(
+                env.get("HEARTBEAT_TIMEOUT", defaults.heartbeat_timeout)
+            ),
+            idle_timeout=float(env.get("IDLE_TIMEOUT", defaults.idle_timeout)),
+            session_memory_budget=int(
+                env.get("SESSION_MEMORY_BUDGET", defaults.session_memory_budget)
+            ),
+            session_spill_dir=env.get("SESSION_SPILL_DIR", defaults.session_spill_dir),
+            batch_concurrency=int(
+                env.get("BATCH_CONCURRENCY", defaults.batch_concurrency)
+            ),
+            shared_store_path=env.get("SHARED_STORE_PATH", defaults.shared_store_path),
+            tool_cache_ttl=float(env.get("TOOL_CACHE_TTL", defaults.tool_cache_ttl)),
+        )
+
+    def validate(self) -> None:
+        """
+        Проверяет, что заданы все API ключи.
+
+        :raises ValueError: Если какой-либо ключ не задан.
+        """
+        if not all(
+            [
+                self.dollar_api_key,
+                self.weather_api_key,
+                self.news_api_key,
+                self.openai_api_key,
+            ]
+        ):
+            raise ValueError(
+                "Один или несколько API ключей не найдены в переменных окружения."
+            )
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Загружает настройки при первом обращении (с учётом .env) и кэширует их.
+
+    Используется как зависимость FastAPI и из кода, которому нужны настройки.
+
+    :return: Объект настроек.
+    """
+    load_dotenv(dotenv_path)
+    return Settings.from_env()
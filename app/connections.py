@@ -1,4 +1,11 @@
-from typing import Any, Dict, List
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
 
 from fastapi import WebSocket
 from loguru import logger
@@ -6,45 +13,173 @@ from openai.types.chat.chat_completion_system_message_param import (
     ChatCompletionSystemMessageParam,
 )
 
+from app.config import SYSTEM_PROMPT, Settings, get_settings
+from app.protocol import FRAME_PING, is_pong, send_frame
+from app.shared_store import create_store, get_store
+
+# Системное сообщение создаётся один раз и разделяется всеми сессиями
+SYSTEM_MESSAGE: ChatCompletionSystemMessageParam = ChatCompletionSystemMessageParam(
+    content=SYSTEM_PROMPT, role="system"
+)
+
+# Коды закрытия WebSocket, выставляемые сервером
+CLOSE_IDLE = 4000
+CLOSE_HEARTBEAT_TIMEOUT = 4001
+
+
+def message_size(message: Any) -> int:
+    """
+    Оценивает размер сообщения в памяти по его JSON-представлению.
+
+    :param message: Сообщение истории.
+    :return: Размер в байтах.
+    """
+    return len(json.dumps(message, ensure_ascii=False, default=str).encode("utf-8"))
+
 
 class ConnectionManager:
     """
     Менеджер для управления WebSocket-соединениями с сохранением истории сообщений.
+
+    Истории всех сессий укладываются в общий бюджет памяти: при его превышении
+    вытесняются истории давно неактивных сессий (с выгрузкой на диск, если задан каталог).
+    Истории сессий, у которых выполняется ход диалога, не вытесняются.
     """
 
-    def __init__(self) -> None:
-        self.active_connections: Dict[WebSocket, List[Any]] = {}
+    def __init__(self, settings: Optional[Settings] = None) -> None:
+        # Истории в памяти в порядке от давно использованных к недавним
+        self.active_connections: "OrderedDict[WebSocket, List[Any]]" = OrderedDict()
+        # Вытесненные истории: путь к файлу на диске или None, если история удалена
+        self.evicted: Dict[WebSocket, Optional[str]] = {}
+        self.history_bytes: Dict[WebSocket, int] = {}
+        self.retained_bytes: int = 0
+        self.last_activity: Dict[WebSocket, float] = {}
+        # Сессии, у которых выполняется ход диалога
+        self.busy: Set[WebSocket] = set()
+        # Идентификаторы сессий, переданные клиентами, для сохранения в общем хранилище
+        self.session_ids: Dict[WebSocket, str] = {}
+        self._settings = settings
+        self._store: Any = None
 
-    async def connect(self, websocket: WebSocket) -> None:
+    @property
+    def settings(self) -> Settings:
+        """
+        Настройки менеджера: переданные явно или общие настройки приложения.
+        """
+        return self._settings or get_settings()
+
+    @property
+    def store(self) -> Any:
+        """
+        Хранилище сессий: созданное по явно переданным настройкам или общее для приложения.
+        """
+        if self._settings is None:
+            return get_store()
+        if self._store is None:
+            self._store = create_store(self._settings.shared_store_path)
+        return self._store
+
+    async def connect(
+        self, websocket: WebSocket, session_id: Optional[str] = None
+    ) -> None:
         """
         Устанавливает WebSocket-соединение и инициализирует историю сообщений.
 
+        Если задан идентификатор сессии и настроено общее хранилище (``SHARED_STORE_PATH``),
+        история продолжается с того места, где клиент отключился, даже если
+        он переподключился к другому воркеру.
+
         :param websocket: Объект WebSocket.
+        :param session_id: Идентификатор сессии клиента.
         """
         await websocket.accept()
-        self.active_connections[websocket] = [
-            ChatCompletionSystemMessageParam(
-                content=(
-                    "Используй смайлики, когда они уместны 😊, "
-                    "а также для структурирования текста. Пиши структурированно и по делу, "
-                    "минимизируй количество воды. В своих ответах используй Markdown, "
-                    "также код оборачивай в ```язык\n<код>\n```."
-                ),
-                role="system",
-            )
-        ]
+        self.register(websocket)
+        if session_id and self.settings.shared_store_path:
+            self.session_ids[websocket] = session_id
+            try:
+                stored = await asyncio.to_thread(self.store.get, "session", session_id)
+            except Exception as e:
+                # Ошибка хранилища не мешает подключению: сессия начинается заново
+                logger.error("Ошибка восстановления сессии {}: {}", session_id, e)
+                stored = None
+            if stored:
+                for message in stored[1:]:
+                    self.add_message(websocket, message)
+                logger.info("Сессия {} восстановлена из общего хранилища.", session_id)
         logger.info("Установлено WebSocket-соединение: {}", websocket.client)
 
+    def register(self, channel: Any, messages: Iterable[Any] = ()) -> None:
+        """
+        Создает историю для канала без WebSocket-рукопожатия (например, HTTP-запроса).
+
+        :param channel: Канал вывода, к которому привязывается история.
+        :param messages: Начальные сообщения диалога после системного.
+        """
+        self.active_connections[channel] = [SYSTEM_MESSAGE]
+        self._set_size(channel, message_size(SYSTEM_MESSAGE))
+        self._touch(channel)
+        for message in messages:
+            self.add_message(channel, message)
+
+    async def save_session(self, websocket: WebSocket) -> None:
+        """
+        Сохраняет историю в общее хранилище после завершённого хода, чтобы клиент
+        мог продолжить сессию на любом воркере сразу после обрыва соединения.
+
+        Ошибки хранилища не прерывают диалог: они только записываются в лог.
+
+        :param websocket: Объект WebSocket.
+        """
+        session_id = self.session_ids.get(websocket)
+        if not session_id:
+            return
+        history = list(self.get_history(websocket))
+        try:
+            await asyncio.to_thread(
+                self.store.set,
+                "session",
+                session_id,
+                history,
+                self.settings.idle_timeout,
+            )
+        except Exception as e:
+            logger.error("Ошибка сохранения сессии {}: {}", session_id, e)
+
     def disconnect(self, websocket: WebSocket) -> None:
         """
         Разрывает WebSocket-соединение и удаляет его историю сообщений.
 
+        История в общем хранилище не перезаписывается: она сохраняется после
+        каждого хода, а обрыв может быть замечен позже, чем клиент переподключится.
+
         :param websocket: Объект WebSocket.
         """
-        if websocket in self.active_connections:
-            del self.active_connections[websocket]
+        connected = websocket in self.active_connections or websocket in self.evicted
+        self.session_ids.pop(websocket, None)
+        self.active_connections.pop(websocket, None)
+        self._set_size(websocket, 0)
+        self.last_activity.pop(websocket, None)
+        self.busy.discard(websocket)
+        spill_path = self.evicted.pop(websocket, None)
+        if spill_path and os.path.exists(spill_path):
+            os.remove(spill_path)
+        if connected:
             logger.info("WebSocket отключился: {}", websocket.client)
 
+    @contextmanager
+    def turn(self, websocket: WebSocket) -> Iterator[None]:
+        """
+        Отмечает сессию занятой на время хода диалога, чтобы её история не была
+        вытеснена, пока модель и инструменты с ней работают.
+
+        :param websocket: Объект WebSocket.
+        """
+        self.busy.add(websocket)
+        try:
+            yield
+        finally:
+            self.busy.discard(websocket)
+
     def get_history(self, websocket: WebSocket) -> List[Any]:
         """
         Возвращает историю сообщений для указанного соединения.
@@ -52,14 +187,171 @@ class ConnectionManager:
         :param websocket: Объект WebSocket.
         :return: Список сообщений для данного соединения.
         """
-        return self.active_connections.get(websocket, [])
+        if websocket in self.evicted:
+            self._restore(websocket)
+            self._enforce_budget(keep=websocket)
+        if websocket not in self.active_connections:
+            return []
+        self._touch(websocket)
+        return self.active_connections[websocket]
 
     def add_message(self, websocket: WebSocket, message: Any) -> None:
         """
         Добавляет сообщение в историю определённого WebSocket-соединения.
 
+        Pydantic-сообщения (например, ответ ассистента) сохраняются в виде словарей,
+        чтобы история сериализовалась одинаково на каждом ходе.
+
         :param websocket: Объект WebSocket.
         :param message: Сообщение для добавления.
         """
+        if websocket in self.evicted:
+            self._restore(websocket)
         if websocket in self.active_connections:
+            if hasattr(message, "model_dump"):
+                message = message.model_dump(exclude_none=True)
             self.active_connections[websocket].append(message)
+            self._set_size(
+                websocket, self.history_bytes.get(websocket, 0) + message_size(message)
+            )
+            self._touch(websocket)
+            self._enforce_budget(keep=websocket)
+
+    async def receive_text(self, websocket: WebSocket) -> Optional[str]:
+        """
+        Ожидает сообщение пользователя, поддерживая heartbeat соединения.
+
+        Пока клиент молчит, каждые ``heartbeat_interval`` секунд отправляется ping-кадр.
+        Соединение закрывается, если клиент не отвечает дольше ``heartbeat_timeout``
+        (полуоткрытое соединение) или пользователь не пишет дольше ``idle_timeout``
+        (значения берутся из настроек).
+
+        :param websocket: Объект WebSocket.
+        :return: Текст сообщения пользователя или None, если соединение закрыто сервером.
+        """
+        settings = self.settings
+        last_seen: float = time.monotonic()
+        while True:
+            try:
+                data: str = await asyncio.wait_for(
+                    websocket.receive_text(), settings.heartbeat_interval
+                )
+            except asyncio.TimeoutError:
+                now = time.monotonic()
+                if now - last_seen >= settings.heartbeat_timeout:
+                    logger.warning("Нет ответа на ping от {}.", websocket.client)
+                    await websocket.close(code=CLOSE_HEARTBEAT_TIMEOUT)
+                    return None
+                idle = now - self.last_activity.get(websocket, now)
+                if idle >= settings.idle_timeout:
+                    logger.info("Сессия {} закрыта по простою.", websocket.client)
+                    await websocket.close(code=CLOSE_IDLE)
+                    return None
+                await send_frame(websocket, FRAME_PING, "")
+                continue
+
+            last_seen = time.monotonic()
+            if not is_pong(data):
+                return data
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает текущие показатели сессий.
+
+        :return: Словарь с числом живых, резидентных и вытесненных сессий
+            и объёмом историй в памяти.
+        """
+        return {
+            "live_sessions": len(self.active_connections) + len(self.evicted),
+            "resident_sessions": len(self.active_connections),
+            "evicted_sessions": len(self.evicted),
+            "retained_bytes": self.retained_bytes,
+        }
+
+    def _set_size(self, websocket: WebSocket, size: int) -> None:
+        """
+        Обновляет учтённый размер истории сессии и общий объём.
+
+        :param websocket: Объект WebSocket.
+        :param size: Новый размер истории в байтах (0 - снять с учёта).
+        """
+        self.retained_bytes += size - self.history_bytes.pop(websocket, 0)
+        if size:
+            self.history_bytes[websocket] = size
+
+    def _touch(self, websocket: WebSocket) -> None:
+        """
+        Отмечает активность сессии и переносит её в конец очереди LRU.
+
+        :param websocket: Объект WebSocket.
+        """
+        self.last_activity[websocket] = time.monotonic()
+        self.active_connections.move_to_end(websocket)
+
+    def _enforce_budget(self, keep: WebSocket) -> None:
+        """
+        Вытесняет давно неактивные истории, пока общий объём превышает бюджет.
+
+        Занятые сессии (с выполняющимся ходом) не вытесняются, даже если из-за этого
+        объём временно остаётся выше бюджета.
+
+        :param keep: Соединение, историю которого вытеснять нельзя.
+        """
+        memory_budget = self.settings.session_memory_budget
+        while self.retained_bytes > memory_budget:
+            victim = next(
+                (
+                    ws
+                    for ws in self.active_connections
+                    if ws is not keep and ws not in self.busy
+                ),
+                None,
+            )
+            if victim is None:
+                break
+            self._evict(victim)
+
+    def _evict(self, websocket: WebSocket) -> None:
+        """
+        Вытесняет историю сессии из памяти, выгружая её на диск при наличии каталога.
+
+        Файл записывается синхронно (метод вызывается из add_message в event loop),
+        поэтому ``SESSION_SPILL_DIR`` должен быть на быстром локальном диске.
+
+        :param websocket: Объект WebSocket.
+        """
+        history = self.active_connections.pop(websocket)
+        self._set_size(websocket, 0)
+        spill_dir = self.settings.session_spill_dir
+        spill_path: Optional[str] = None
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            spill_path = os.path.join(spill_dir, f"{uuid.uuid4().hex}.json")
+            with open(spill_path, "w", encoding="utf-8") as f:
+                json.dump(history, f, ensure_ascii=False, default=str)
+        self.evicted[websocket] = spill_path
+        logger.info("История {} вытеснена из памяти.", websocket.client)
+
+    def _restore(self, websocket: WebSocket) -> None:
+        """
+        Возвращает вытесненную историю в память (или начинает новую, если она удалена).
+
+        Бюджет здесь не проверяется: это делает вызывающий метод, уже зная,
+        какую сессию нельзя вытеснять.
+
+        :param websocket: Объект WebSocket.
+        """
+        spill_path = self.evicted.pop(websocket)
+        history: List[Any] = [SYSTEM_MESSAGE]
+        if spill_path and os.path.exists(spill_path):
+            with open(spill_path, "r", encoding="utf-8") as f:
+                history = json.load(f)
+            os.remove(spill_path)
+            # Возвращаем общий объект системного сообщения для стабильного префикса
+            if history and history[0] == SYSTEM_MESSAGE:
+                history[0] = SYSTEM_MESSAGE
+        else:
+            logger.warning("История {} была удалена из памяти.", websocket.client)
+        self.active_connections[websocket] = history
+        self._set_size(websocket, sum(message_size(m) for m in history))
+        self._touch(websocket)
@@ -0,0 +1,124 @@
+from typing import Any, Dict, Optional
+
+
+class UsageStats:
+    """
+    Накопительная статистика использования токенов, включая кэшированные токены промпта.
+    """
+
+    def __init__(self) -> None:
+        self.requests: int = 0
+        self.prompt_tokens: int = 0
+        self.cached_tokens: int = 0
+        self.completion_tokens: int = 0
+
+    def record(self, usage: Any) -> int:
+        """
+        Учитывает данные usage из ответа модели.
+
+        :param usage: Объект usage из последнего чанка стрима.
+        :return: Количество кэшированных токенов промпта в этом запросе.
+        """
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached: int = getattr(details, "cached_tokens", None) or 0
+        self.requests += 1
+        self.prompt_tokens += usage.prompt_tokens or 0
+        self.completion_tokens += usage.completion_tokens or 0
+        self.cached_tokens += cached
+        return cached
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Возвращает текущие значения статистики.
+
+        :return: Словарь со счётчиками и долей кэшированных токенов.
+        """
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cache_hit_ratio": (
+                self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+            ),
+        }
+
+
+usage_stats: UsageStats = UsageStats()
+
+
+class RouteStats:
+    """
+    Статистика задержек и токенов по маршрутам вызовов модели.
+    """
+
+    def __init__(self) -> None:
+        self.routes: Dict[str, Dict[str, Any]] = {}
+
+    def record(
+        self,
+        route: str,
+        model: str,
+        latency: float,
+        first_token_latency: Optional[float] = None,
+        usage: Any = None,
+    ) -> None:
+        """
+        Учитывает один вызов по маршруту.
+
+        :param route: Маршрут вызова.
+        :param model: Использованная модель (или название шаблона).
+        :param latency: Полное время вызова в секундах.
+        :param first_token_latency: Время до первого чанка текста в секундах.
+        :param usage: Объект usage из ответа модели, если есть.
+        """
+        stats = self.routes.setdefault(
+            route,
+            {
+                "calls": 0,
+                "models": {},
+                "total_latency": 0.0,
+                "max_latency": 0.0,
+                "total_first_token_latency": 0.0,
+                "first_token_calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+            },
+        )
+        stats["calls"] += 1
+        stats["models"][model] = stats["models"].get(model, 0) + 1
+        stats["total_latency"] += latency
+        stats["max_latency"] = max(stats["max_latency"], latency)
+        if first_token_latency is not None:
+            stats["total_first_token_latency"] += first_token_latency
+            stats["first_token_calls"] += 1
+        if usage is not None:
+            stats["prompt_tokens"] += usage.prompt_tokens or 0
+            stats["completion_tokens"] += usage.completion_tokens or 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Возвращает статистику по маршрутам со средними задержками.
+
+        :return: Словарь маршрут -> статистика.
+        """
+        result: Dict[str, Any] = {}
+        for route, stats in self.routes.items():
+            first_token_calls = stats["first_token_calls"]
+            result[route] = {
+                "calls": stats["calls"],
+                "models": dict(stats["models"]),
+                "avg_latency": stats["total_latency"] / stats["calls"],
+                "max_latency": stats["max_latency"],
+                "avg_first_token_latency": (
+                    stats["total_first_token_latency"] / first_token_calls
+                    if first_token_calls
+                    else None
+                ),
+                "prompt_tokens": stats["prompt_tokens"],
+                "completion_tokens": stats["completion_tokens"],
+            }
+        return result
+
+
+route_stats: RouteStats = RouteStats()
@@ -0,0 +1,105 @@
+import json
+import uuid
+from typing import Any, Dict, Union
+
+import msgpack
+
+# Типы кадров потокового протокола
+FRAME_START = "start"
+FRAME_DELTA = "delta"
+FRAME_DONE = "done"
+FRAME_TOOL = "tool"
+FRAME_PING = "ping"
+FRAME_PONG = "pong"
+
+# Ответ клиента на ping-кадр (совпадает с JSON.stringify({type: "pong"}))
+PONG_MESSAGE = '{"type":"pong"}'
+
+# Статусы выполнения инструментов
+TOOL_STARTED = "started"
+TOOL_FINISHED = "finished"
+TOOL_FAILED = "failed"
+
+# Кодировки кадров: JSON в текстовых кадрах или MessagePack в бинарных
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+ENCODINGS = (ENCODING_JSON, ENCODING_MSGPACK)
+
+
+def is_pong(data: str) -> bool:
+    """
+    Проверяет, является ли сообщение клиента ответом на ping-кадр.
+
+    :param data: Текст сообщения от клиента.
+    :return: True, если это pong-кадр.
+    """
+    return data == PONG_MESSAGE
+
+
+def new_message_id() -> str:
+    """
+    Генерирует уникальный идентификатор сообщения ассистента.
+
+    :return: Строковый идентификатор сообщения.
+    """
+    return uuid.uuid4().hex
+
+
+def make_frame(frame_type: str, message_id: str, **payload: Any) -> Dict[str, Any]:
+    """
+    Формирует кадр потокового протокола.
+
+    :param frame_type: Тип кадра (start, delta, done, tool).
+    :param message_id: Идентификатор сообщения, к которому относится кадр.
+    :param payload: Дополнительные поля кадра.
+    :return: Словарь с данными кадра.
+    """
+    return {"type": frame_type, "id": message_id, **payload}
+
+
+def encode_frame(
+    frame: Dict[str, Any], encoding: str = ENCODING_JSON
+) -> Union[str, bytes]:
+    """
+    Сериализует кадр для отправки клиенту.
+
+    :param frame: Кадр протокола.
+    :param encoding: Кодировка кадра (json или msgpack).
+    :return: JSON-строка или байты MessagePack.
+    """
+    if encoding == ENCODING_MSGPACK:
+        return msgpack.packb(frame)
+    return json.dumps(frame, ensure_ascii=False, separators=(",", ":"))
+
+
+def get_encoding(websocket: Any) -> str:
+    """
+    Возвращает кодировку кадров, выбранную для WebSocket-соединения.
+
+    :param websocket: Объект WebSocket.
+    :return: Кодировка кадров (по умолчанию json).
+    """
+    state = getattr(websocket, "state", None)
+    return getattr(state, "frame_encoding", ENCODING_JSON)
+
+
+async def send_frame(
+    websocket: Any, frame_type: str, message_id: str, **payload: Any
+) -> None:
+    """
+    Формирует, сериализует и отправляет кадр через WebSocket.
+
+    Кадры MessagePack отправляются бинарными сообщениями, JSON - текстовыми.
+
+    :param websocket: Объект WebSocket.
+    :param frame_type: Тип кадра.
+    :param message_id: Идентификатор сообщения.
+    :param payload: Дополнительные поля кадра.
+    """
+    frame = make_frame(frame_type, message_id, **payload)
+    encoding = get_encoding(websocket)
+    data = encode_frame(frame, encoding)
+    if encoding == ENCODING_MSGPACK:
+        await websocket.send_bytes(data)
+    else:
+        await websocket.send_text(data)
@@ -1,58 +1,214 @@
-from typing import Any
+import asyncio
+import re
+import time
+from typing import Any, AsyncIterator, Optional
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from loguru import logger
 from openai.types.chat.chat_completion_user_message_param import (
     ChatCompletionUserMessageParam,
 )
 
-from app.chat_integration import create_stream_message, process_tool_calls
-from app.config import USER
+from app.channels import NullChannel, SSEChannel
+from app.chat_integration import (
+    create_stream_message,
+    create_templated_message,
+    process_tool_calls,
+)
+from app.config import USER, Settings, get_settings
 from app.connections import ConnectionManager
+from app.metrics import route_stats, usage_stats
+from app.routing import ROUTE_ANSWER, ROUTE_DISPATCH, get_model_router
+from app.protocol import ENCODING_JSON, ENCODINGS
+from app.schemas import (
+    BatchChatItem,
+    BatchChatRequest,
+    BatchChatResponse,
+    ChatRequest,
+)
 
 router: APIRouter = APIRouter()
+# Допустимый идентификатор сессии клиента. Он единственный защищает сохранённую
+# историю, поэтому должен быть случайным и не короче 128 бит (32 hex-символа)
+SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{32,64}")
 manager: ConnectionManager = ConnectionManager()
+# Истории HTTP API учитываются отдельно, чтобы пакетные запросы
+# не вытесняли истории интерактивных WebSocket-сессий
+http_manager: ConnectionManager = ConnectionManager()
+
+
+async def run_chat_turn(
+    channel: Any, connections: ConnectionManager = manager
+) -> Any:
+    """
+    Выполняет один ход диалога по истории канала: ответ модели, вызов инструментов
+    и финальный ответ. Используется WebSocket-чатом и HTTP API.
+
+    :param channel: Канал вывода (WebSocket или его заменитель), к которому привязана история.
+    :param connections: Менеджер, в котором хранится история канала.
+    :return: Финальное сообщение ассистента.
+    """
+    history: Any = connections.get_history(channel)
+    # Первый вызов ChatGPT - ответ ассистента на сообщение пользователя
+    assistant_message = await create_stream_message(
+        history, channel, route=ROUTE_DISPATCH
+    )
+
+    # Если ассистент вызвал инструменты, обрабатываем их
+    if assistant_message.tool_calls:
+        tool_calls = assistant_message.tool_calls
+        tool_responses = await process_tool_calls(
+            assistant_message, channel, connections
+        )
+        if get_model_router().can_template(tool_calls):
+            # Простые результаты отправляем по шаблону без второго вызова
+            assistant_message = await create_templated_message(
+                tool_calls, tool_responses, channel
+            )
+        else:
+            # Второй вызов ChatGPT с учётом результата работы инструментов
+            history = connections.get_history(channel)
+            assistant_message = await create_stream_message(
+                history, channel, route=ROUTE_ANSWER
+            )
+
+    logger.success("Отправка сообщения ассистента: {}", assistant_message.content)
+    # Добавляем финальное сообщение ассистента в историю
+    connections.add_message(channel, assistant_message)
+    await connections.save_session(channel)
+    return assistant_message
 
 
 @router.websocket("/api/chat/")
-async def chat_endpoint(websocket: WebSocket) -> None:
+async def chat_endpoint(
+    websocket: WebSocket, settings: Settings = Depends(get_settings)
+) -> None:
     """
     Обработчик WebSocket для чата.
+
+    Параметр запроса ``encoding`` (json или msgpack) задаёт кодировку кадров стриминга,
+    ``session`` - идентификатор сессии для продолжения диалога после переподключения.
     """
-    await manager.connect(websocket)
+    encoding: str = websocket.query_params.get("encoding", settings.ws_frame_encoding)
+    if encoding not in ENCODINGS:
+        logger.warning("Неизвестная кодировка кадров {}, используется json.", encoding)
+        encoding = ENCODING_JSON
+    websocket.state.frame_encoding = encoding
+    session_id: Optional[str] = websocket.query_params.get("session")
+    if session_id and not SESSION_ID_PATTERN.fullmatch(session_id):
+        logger.warning("Некорректный идентификатор сессии: {}", session_id)
+        session_id = None
     try:
+        await manager.connect(websocket, session_id)
         while True:
-            data: str = await websocket.receive_text()
+            data: Optional[str] = await manager.receive_text(websocket)
+            if data is None:
+                # Соединение закрыто сервером по heartbeat или простою
+                break
             logger.info("Получено сообщение от клиента: {}", data)
 
             user_message: ChatCompletionUserMessageParam = (
                 ChatCompletionUserMessageParam(role=USER, content=data)
             )
-            manager.add_message(websocket, user_message)
-
-            history: Any = manager.get_history(websocket)
-            # Первый вызов ChatGPT - ответ ассистента на сообщение пользователя
-            assistant_message = await create_stream_message(history, websocket)
-
-            # Если ассистент вызвал инструменты, обрабатываем их
-            if assistant_message.tool_calls:
-                await process_tool_calls(assistant_message, websocket, manager)
-                # Второй вызов ChatGPT с учётом результата работы инструментов
-                history = manager.get_history(websocket)
-                assistant_message = await create_stream_message(history, websocket)
-
-            logger.success(
-                "Отправка сообщения ассистента: {}", assistant_message.content
-            )
-            # Добавляем финальное сообщение ассистента в историю
-            manager.add_message(websocket, assistant_message)
+            # Сессия занята с момента добавления сообщения пользователя до ответа
+            with manager.turn(websocket):
+                manager.add_message(websocket, user_message)
+                await run_chat_turn(websocket)
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
         logger.info("Клиент отключился от WebSocket.")
     except Exception as e:
         logger.exception("Ошибка в процессе обработки чата: {}", e)
         await websocket.close()
+    finally:
+        # История освобождается при любом завершении соединения
+        manager.disconnect(websocket)
+
+
+@router.post("/api/chat/stream/")
+async def chat_stream_endpoint(request: ChatRequest) -> StreamingResponse:
+    """
+    HTTP-эндпоинт для неинтерактивного чата: принимает диалог и возвращает
+    ответ ассистента потоком Server-Sent Events.
+
+    Каждое событие без имени содержит кадр стриминга (как в WebSocket-чате),
+    в конце отправляется событие ``end`` с итоговым ответом или ``error``.
+    """
+    channel = SSEChannel(client="http-stream")
+
+    async def produce() -> None:
+        try:
+            with http_manager.turn(channel):
+                http_manager.register(
+                    channel,
+                    [message.model_dump() for message in request.messages],
+                )
+                assistant_message = await run_chat_turn(channel, http_manager)
+            await channel.send_event("end", {"content": assistant_message.content})
+        except Exception as e:
+            logger.exception("Ошибка в процессе обработки чата: {}", e)
+            await channel.send_event("error", {"detail": str(e)})
+        finally:
+            http_manager.disconnect(channel)
+            await channel.close()
+
+    async def events() -> AsyncIterator[str]:
+        task = asyncio.create_task(produce())
+        try:
+            while (event := await channel.queue.get()) is not None:
+                yield event
+        finally:
+            # Клиент отключился раньше времени - прекращаем обработку
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.post("/api/chat/batch/", response_model=BatchChatResponse)
+async def chat_batch_endpoint(
+    request: BatchChatRequest, settings: Settings = Depends(get_settings)
+) -> BatchChatResponse:
+    """
+    HTTP-эндпоинт для пакетной обработки независимых промптов.
+
+    Промпты обрабатываются параллельно, но не более ``concurrency`` одновременно
+    (по умолчанию ``BATCH_CONCURRENCY``). Для каждого возвращаются ответ и задержка.
+    """
+    semaphore = asyncio.Semaphore(request.concurrency or settings.batch_concurrency)
+    started: float = time.perf_counter()
+
+    async def process(index: int, prompt: str) -> BatchChatItem:
+        async with semaphore:
+            channel = NullChannel(client=f"http-batch-{index}")
+            item_started: float = time.perf_counter()
+            try:
+                with http_manager.turn(channel):
+                    http_manager.register(
+                        channel,
+                        [ChatCompletionUserMessageParam(role=USER, content=prompt)],
+                    )
+                    assistant_message = await run_chat_turn(channel, http_manager)
+                content, error = assistant_message.content, None
+            except Exception as e:
+                logger.exception("Ошибка обработки промпта {}: {}", index, e)
+                content, error = None, str(e)
+            finally:
+                http_manager.disconnect(channel)
+            return BatchChatItem(
+                index=index,
+                prompt=prompt,
+                content=content,
+                error=error,
+                latency=time.perf_counter() - item_started,
+            )
+
+    results = await asyncio.gather(
+        *(process(index, prompt) for index, prompt in enumerate(request.prompts))
+    )
+    return BatchChatResponse(
+        results=list(results), total_latency=time.perf_counter() - started
+    )
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -67,3 +223,19 @@ async def get_index() -> HTMLResponse:
     except Exception as e:
         logger.exception("Ошибка загрузки HTML страницы: {}", e)
         return HTMLResponse(content="Ошибка загрузки страницы.", status_code=500)
+
+
+@router.get("/api/metrics/", response_class=JSONResponse)
+async def get_metrics() -> JSONResponse:
+    """
+    Эндпоинт для получения статистики токенов, задержек по маршрутам и сессий
+    (WebSocket-чата и HTTP API отдельно).
+    """
+    return JSONResponse(
+        content={
+            "usage": usage_stats.snapshot(),
+            "routes": route_stats.snapshot(),
+            "sessions": manager.stats(),
+            "http_sessions": http_manager.stats(),
+        }
+    )
@@ -0,0 +1,88 @@
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional
+
+from app.config import Settings, get_settings
+from app.tool_templates import TOOL_TEMPLATES
+
+# Маршруты вызовов модели
+ROUTE_DISPATCH = "dispatch"  # первый вызов: ответ пользователю или выбор инструментов
+ROUTE_ANSWER = "answer"  # второй вызов: ответ с учётом результатов инструментов
+ROUTE_TEMPLATE = "template"  # ответ по шаблону без вызова модели
+
+
+class ModelRouter:
+    """
+    Политика выбора модели для каждого вызова ChatGPT.
+
+    :raises ValueError: Если для инструмента из templated_tools нет шаблона ответа.
+    """
+
+    def __init__(
+        self,
+        dispatch_model: str,
+        answer_model: str,
+        long_history_model: str = "",
+        long_history_threshold: int = 40,
+        templated_tools: Optional[Iterable[str]] = None,
+    ) -> None:
+        self.dispatch_model = dispatch_model
+        self.answer_model = answer_model
+        self.long_history_model = long_history_model
+        self.long_history_threshold = long_history_threshold
+        self.templated_tools = frozenset(templated_tools or [])
+        missing = sorted(self.templated_tools - TOOL_TEMPLATES.keys())
+        if missing:
+            raise ValueError(
+                "Нет шаблона ответа для инструментов: " + ", ".join(missing)
+            )
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "ModelRouter":
+        """
+        Создает политику маршрутизации из настроек приложения.
+
+        :param settings: Настройки приложения.
+        :return: Объект политики маршрутизации.
+        """
+        return cls(
+            settings.dispatch_model,
+            settings.answer_model,
+            settings.long_history_model,
+            settings.long_history_threshold,
+            settings.templated_tools,
+        )
+
+    def select_model(self, route: str, history: List[Any]) -> str:
+        """
+        Выбирает модель для вызова по маршруту и длине истории.
+
+        :param route: Маршрут вызова (dispatch или answer).
+        :param history: История сообщений, передаваемая в модель.
+        :return: Название модели.
+        """
+        if self.long_history_model and len(history) >= self.long_history_threshold:
+            return self.long_history_model
+        if route == ROUTE_DISPATCH:
+            return self.dispatch_model
+        return self.answer_model
+
+    def can_template(self, tool_calls: List[Any]) -> bool:
+        """
+        Проверяет, можно ли ответить по шаблону без второго вызова модели.
+
+        :param tool_calls: Вызовы инструментов из сообщения ассистента.
+        :return: True, если все вызванные инструменты допускают шаблонный ответ.
+        """
+        return bool(tool_calls) and all(
+            tool_call.function.name in self.templated_tools for tool_call in tool_calls
+        )
+
+
+@lru_cache(maxsize=1)
+def get_model_router() -> ModelRouter:
+    """
+    Возвращает политику маршрутизации, созданную из настроек при первом обращении.
+
+    :return: Объект политики маршрутизации.
+    """
+    return ModelRouter.from_settings(get_settings())
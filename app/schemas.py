@@ -0,0 +1,66 @@
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+
+class ChatMessageIn(BaseModel):
+    """
+    Сообщение диалога, переданное через HTTP API.
+    """
+
+    role: Literal["user", "assistant"]
+    content: str
+
+
+class ChatRequest(BaseModel):
+    """
+    Запрос на ответ ассистента по диалогу (последнее сообщение - от пользователя).
+    """
+
+    messages: List[ChatMessageIn] = Field(..., min_length=1)
+
+    @field_validator("messages")
+    @classmethod
+    def last_message_from_user(
+        cls, messages: List[ChatMessageIn]
+    ) -> List[ChatMessageIn]:
+        """
+        Проверяет, что диалог заканчивается сообщением пользователя.
+
+        :param messages: Сообщения диалога.
+        :return: Те же сообщения.
+        :raises ValueError: Если последнее сообщение - от ассистента.
+        """
+        if messages and messages[-1].role != "user":
+            raise ValueError("Последнее сообщение должно быть от пользователя.")
+        return messages
+
+
+class BatchChatRequest(BaseModel):
+    """
+    Запрос на пакетную обработку независимых промптов.
+    """
+
+    prompts: List[str] = Field(..., min_length=1, max_length=100)
+    concurrency: Optional[int] = Field(None, ge=1, le=32)
+
+
+class BatchChatItem(BaseModel):
+    """
+    Результат обработки одного промпта в пакете.
+    """
+
+    index: int
+    prompt: str
+    content: Optional[str] = None
+    error: Optional[str] = None
+    latency: float
+
+
+class BatchChatResponse(BaseModel):
+    """
+    Результаты пакетной обработки промптов.
+    """
+
+    results: List[BatchChatItem]
+    total_latency: float
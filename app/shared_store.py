@@ -0,0 +1,213 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import get_settings
+
+# Как часто (в секундах) запись в хранилище заодно удаляет записи с истёкшим сроком
+PURGE_INTERVAL = 60.0
+
+
+class MemoryStore:
+    """
+    Хранилище «ключ-значение» с TTL в памяти процесса.
+
+    Используется, когда общее хранилище между воркерами не настроено.
+    """
+
+    def __init__(self) -> None:
+        self._data: Dict[Tuple[str, str], Tuple[Any, Optional[float]]] = {}
+        self._lock = threading.Lock()
+        self._last_purge = time.monotonic()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """
+        Возвращает значение по ключу или None, если его нет или срок истёк.
+
+        :param namespace: Пространство имён (например, weather или session).
+        :param key: Ключ.
+        :return: Сохранённое значение или None.
+        """
+        with self._lock:
+            item = self._data.get((namespace, key))
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[(namespace, key)]
+                return None
+            return value
+
+    def set(
+        self, namespace: str, key: str, value: Any, ttl: Optional[float] = None
+    ) -> None:
+        """
+        Сохраняет значение по ключу.
+
+        :param namespace: Пространство имён.
+        :param key: Ключ.
+        :param value: Значение (должно сериализоваться в JSON).
+        :param ttl: Время жизни в секундах (None - бессрочно).
+        """
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[(namespace, key)] = (value, expires_at)
+        if time.monotonic() - self._last_purge >= PURGE_INTERVAL:
+            self.purge_expired()
+
+    def delete(self, namespace: str, key: str) -> None:
+        """
+        Удаляет значение по ключу.
+
+        :param namespace: Пространство имён.
+        :param key: Ключ.
+        """
+        with self._lock:
+            self._data.pop((namespace, key), None)
+
+    def purge_expired(self) -> int:
+        """
+        Удаляет записи с истёкшим сроком жизни.
+
+        :return: Количество удалённых записей.
+        """
+        now = time.time()
+        with self._lock:
+            self._last_purge = time.monotonic()
+            expired = [
+                item_key
+                for item_key, (_, expires_at) in self._data.items()
+                if expires_at is not None and expires_at <= now
+            ]
+            for item_key in expired:
+                del self._data[item_key]
+        return len(expired)
+
+
+class SQLiteStore:
+    """
+    Хранилище «ключ-значение» с TTL в SQLite (режим WAL), общее для всех воркеров
+    на одной машине.
+
+    Каждый поток каждого процесса открывает собственное соединение, поэтому
+    хранилище можно создавать до fork и использовать из asyncio.to_thread.
+    Записи с истёкшим сроком удаляются при записи не чаще раза в ``PURGE_INTERVAL``.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._last_purge = time.monotonic()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "expires_at REAL, PRIMARY KEY (namespace, key))"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Возвращает соединение текущего потока (и процесса), открывая его при необходимости.
+
+        :return: Соединение с базой SQLite.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """
+        Возвращает значение по ключу или None, если его нет или срок истёк.
+
+        :param namespace: Пространство имён (например, weather или session).
+        :param key: Ключ.
+        :return: Сохранённое значение или None.
+        """
+        row = (
+            self._connection()
+            .execute(
+                "SELECT value FROM kv WHERE namespace = ? AND key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time()),
+            )
+            .fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    def set(
+        self, namespace: str, key: str, value: Any, ttl: Optional[float] = None
+    ) -> None:
+        """
+        Сохраняет значение по ключу.
+
+        :param namespace: Пространство имён.
+        :param key: Ключ.
+        :param value: Значение (должно сериализоваться в JSON).
+        :param ttl: Время жизни в секундах (None - бессрочно).
+        """
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._connection().execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                namespace,
+                key,
+                json.dumps(value, ensure_ascii=False, default=str),
+                expires_at,
+            ),
+        )
+        if time.monotonic() - self._last_purge >= PURGE_INTERVAL:
+            self.purge_expired()
+
+    def delete(self, namespace: str, key: str) -> None:
+        """
+        Удаляет значение по ключу.
+
+        :param namespace: Пространство имён.
+        :param key: Ключ.
+        """
+        self._connection().execute(
+            "DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+        )
+
+    def purge_expired(self) -> int:
+        """
+        Удаляет записи с истёкшим сроком жизни.
+
+        :return: Количество удалённых записей.
+        """
+        self._last_purge = time.monotonic()
+        cursor = self._connection().execute(
+            "DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time(),),
+        )
+        return cursor.rowcount
+
+
+def create_store(path: str) -> Any:
+    """
+    Создает хранилище: SQLite по указанному пути или в памяти процесса, если путь пуст.
+
+    :param path: Путь к базе SQLite.
+    :return: Объект MemoryStore или SQLiteStore.
+    """
+    return SQLiteStore(path) if path else MemoryStore()
+
+
+@lru_cache(maxsize=1)
+def get_store() -> Any:
+    """
+    Возвращает хранилище кэшей и сессий приложения (SQLite, если задан
+    ``SHARED_STORE_PATH``, иначе в памяти процесса).
+
+    :return: Объект MemoryStore или SQLiteStore.
+    """
+    return create_store(get_settings().shared_store_path)
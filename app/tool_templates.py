@@ -0,0 +1,37 @@
+from typing import Callable, Dict
+
+from app.api_clients import DOLLAR_RATE_PREFIX
+
+
+def bullet_lines(content: str) -> str:
+    """
+    Оформляет каждую строку результата инструмента пунктом списка.
+
+    :param content: Результат инструмента.
+    :return: Markdown-список.
+    """
+    return "\n".join(f"- {line}" for line in content.splitlines() if line.strip())
+
+
+def dollar_rate_template(content: str) -> str:
+    """
+    Оставляет из результата get_dollar_rate только курс USD к RUB.
+
+    :param content: Результат get_dollar_rate.
+    :return: Строка с курсом или сообщение об ошибке инструмента.
+    """
+    for line in content.splitlines():
+        if line.startswith(DOLLAR_RATE_PREFIX):
+            return f"💵 {line}"
+    if content.startswith("Курсы:"):
+        return "Курс рубля недоступен."
+    return content
+
+
+# Шаблоны ответа пользователю по результату инструмента без второго вызова модели.
+# В TEMPLATED_TOOLS допускаются только инструменты, для которых здесь есть шаблон
+TOOL_TEMPLATES: Dict[str, Callable[[str], str]] = {
+    "get_weather": bullet_lines,
+    "get_dollar_rate": dollar_rate_template,
+    "get_weekly_news": bullet_lines,
+}
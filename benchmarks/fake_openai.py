@@ -0,0 +1,133 @@
+"""
+Имитация OpenAI Chat Completions API для нагрузочных бенчмарков.
+
+Отвечает на любой POST-запрос фиксированным потоком SSE-чанков без вызовов
+инструментов. Это минимальный HTTP-сервер на asyncio: ответ отдаётся целиком
+с Content-Length и закрытием соединения, чтобы имитация не становилась узким
+местом и не вносила собственных ошибок в измерения.
+
+Запуск:
+    python -m benchmarks.fake_openai --port 8101 --chunks 200
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Optional
+
+TOKEN = "Привет 😊 "
+
+
+def make_chunk(
+    delta: dict, finish_reason: Optional[str] = None, usage: Optional[dict] = None
+) -> str:
+    """
+    Формирует SSE-событие с чанком ответа модели.
+
+    :param delta: Приращение сообщения.
+    :param finish_reason: Причина завершения генерации.
+    :param usage: Статистика токенов (для последнего чанка).
+    :return: Строка SSE-события.
+    """
+    chunk = {
+        "id": "chatcmpl-benchmark",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": "gpt-4o",
+        "choices": (
+            [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            if usage is None
+            else []
+        ),
+        "usage": usage,
+    }
+    return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+
+def make_response(chunks: int) -> bytes:
+    """
+    Формирует полный HTTP-ответ с потоком из указанного числа чанков.
+
+    :param chunks: Число чанков с текстом.
+    :return: Байты HTTP-ответа.
+    """
+    events = [make_chunk({"role": "assistant", "content": ""})]
+    events += [make_chunk({"content": TOKEN}) for _ in range(chunks)]
+    events.append(make_chunk({}, finish_reason="stop"))
+    events.append(
+        make_chunk(
+            {},
+            usage={
+                "prompt_tokens": 1000,
+                "completion_tokens": chunks,
+                "total_tokens": 1000 + chunks,
+                "prompt_tokens_details": {"cached_tokens": 768},
+            },
+        )
+    )
+    events.append("data: [DONE]\n\n")
+    body = "".join(events).encode()
+    head = (
+        "HTTP/1.1 200 OK\r\n"
+        "Content-Type: text/event-stream\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+async def handle(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, response: bytes
+) -> None:
+    """
+    Читает запрос (заголовки и тело) и отправляет заготовленный ответ.
+
+    :param reader: Поток чтения соединения.
+    :param writer: Поток записи соединения.
+    :param response: Байты HTTP-ответа.
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in head.decode("latin-1").split("\r\n"):
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        if length:
+            await reader.readexactly(length)
+        writer.write(response)
+        await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int, chunks: int) -> None:
+    """
+    Запускает сервер имитации и обслуживает запросы до остановки процесса.
+
+    :param host: Адрес для прослушивания.
+    :param port: Порт.
+    :param chunks: Число чанков в каждом ответе.
+    """
+    response = make_response(chunks)
+    server = await asyncio.start_server(
+        lambda reader, writer: handle(reader, writer, response), host, port
+    )
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--chunks", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.chunks))
+
+
+if __name__ == "__main__":
+    main()
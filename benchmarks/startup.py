@@ -0,0 +1,78 @@
+"""
+Бенчмарк холодного старта: время импорта приложения и задержка первого запроса.
+
+Каждый замер выполняется в отдельном процессе, чтобы импорт был «холодным».
+Если медиана превышает целевое значение, скрипт завершается с кодом 1.
+
+Запуск:
+    python -m benchmarks.startup --runs 5 --target-ms 1500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+# Код, выполняемый в дочернем процессе: импорт main, старт lifespan и первый запрос
+PROBE = """
+import json, os, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    client.get("/api/metrics/")
+    first_request = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (first_request - ready) * 1000,
+    "total_ms": (first_request - started) * 1000,
+}))
+"""
+
+
+def run_probe() -> Dict[str, float]:
+    """
+    Выполняет один замер в отдельном процессе.
+
+    :return: Словарь с временами этапов в миллисекундах.
+    """
+    env = dict(os.environ)
+    # Для lifespan нужны все ключи; в бенчмарке подойдут фиктивные значения
+    for key in ("DOLLAR_API_KEY", "WEATHER_API_KEY", "NEWS_API_KEY", "OPENAI_API_KEY"):
+        env[key] = env.get(key) or "benchmark"
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=env,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=1500.0)
+    args = parser.parse_args()
+
+    results: List[Dict[str, float]] = [run_probe() for _ in range(args.runs)]
+    print(f"{'этап':<18} {'медиана, мс':>12} {'макс, мс':>10}")
+    for stage in ("import_ms", "startup_ms", "first_request_ms", "total_ms"):
+        values = [result[stage] for result in results]
+        print(f"{stage:<18} {statistics.median(values):>12.1f} {max(values):>10.1f}")
+
+    total = statistics.median(result["total_ms"] for result in results)
+    if total > args.target_ms:
+        print(f"Холодный старт {total:.1f} мс превышает цель {args.target_ms:.1f} мс")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Бенчмарк пропускной способности чата в зависимости от числа воркеров hypercorn.
+
+Запускает имитацию OpenAI (benchmarks.fake_openai) и приложение с разным числом
+воркеров (hypercorn_conf.py), затем открывает параллельные WebSocket-сессии и
+считает завершённые ходы диалога и кадры в секунду.
+
+Запуск:
+    python -m benchmarks.throughput --workers 1,2,4 --clients 32 --turns 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Tuple
+
+import websockets
+
+HOST = "127.0.0.1"
+
+
+def start_process(args: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    """
+    Запускает процесс в отдельной группе, чтобы затем остановить его вместе с воркерами.
+
+    :param args: Команда запуска.
+    :param env: Переменные окружения.
+    :return: Объект процесса.
+    """
+    return subprocess.Popen(
+        args,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def stop_process(process: subprocess.Popen) -> None:
+    """
+    Останавливает процесс и все его воркеры.
+
+    :param process: Объект процесса.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=10)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def wait_ready(url: str, timeout: float = 30.0) -> None:
+    """
+    Ожидает, пока сервер начнёт отвечать на HTTP-запросы.
+
+    :param url: URL для проверки.
+    :param timeout: Максимальное время ожидания в секундах.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"Сервер {url} не запустился за {timeout} с")
+
+
+async def run_client(url: str, turns: int) -> int:
+    """
+    Проводит несколько ходов диалога в одной WebSocket-сессии.
+
+    :param url: URL WebSocket-эндпоинта.
+    :param turns: Число ходов.
+    :return: Число полученных кадров.
+    """
+    frames = 0
+    async with websockets.connect(url, max_size=None) as ws:
+        for _ in range(turns):
+            await ws.send("Привет")
+            while True:
+                frame = json.loads(await ws.recv())
+                frames += 1
+                if frame["type"] == "done" and not frame.get("tool_calls"):
+                    break
+    return frames
+
+
+async def run_load(port: int, clients: int, turns: int) -> Tuple[float, int]:
+    """
+    Запускает параллельные сессии и измеряет общее время.
+
+    :return: Время в секундах и общее число кадров.
+    """
+    url = f"ws://{HOST}:{port}/api/chat/"
+    started = time.perf_counter()
+    frames = await asyncio.gather(*(run_client(url, turns) for _ in range(clients)))
+    return time.perf_counter() - started, sum(frames)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--fake-port", type=int, default=8101)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    fake = start_process(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.fake_openai",
+            "--host",
+            HOST,
+            "--port",
+            str(args.fake_port),
+            "--chunks",
+            str(args.chunks),
+        ],
+        env,
+    )
+    print(f"CPU: {os.cpu_count()}, клиентов: {args.clients}, ходов: {args.turns}")
+    print(f"{'воркеров':>8} {'ходов/с':>10} {'кадров/с':>12} {'время, с':>10}")
+    try:
+        wait_ready(f"http://{HOST}:{args.fake_port}/")
+        for workers in [int(value) for value in args.workers.split(",")]:
+            with tempfile.TemporaryDirectory() as data_dir:
+                app_env = dict(env)
+                app_env.update(
+                    {
+                        "WORKERS": str(workers),
+                        "BIND": f"{HOST}:{args.port}",
+                        "OPENAI_BASE_URL": f"http://{HOST}:{args.fake_port}/v1",
+                        "SHARED_STORE_PATH": os.path.join(data_dir, "shared.db"),
+                    }
+                )
+                for key in (
+                    "DOLLAR_API_KEY",
+                    "WEATHER_API_KEY",
+                    "NEWS_API_KEY",
+                    "OPENAI_API_KEY",
+                ):
+                    app_env[key] = app_env.get(key) or "benchmark"
+                server = start_process(
+                    [
+                        sys.executable,
+                        "-m",
+                        "hypercorn",
+                        "--config",
+                        "file:hypercorn_conf.py",
+                        "main:app",
+                    ],
+                    app_env,
+                )
+                try:
+                    wait_ready(f"http://{HOST}:{args.port}/api/metrics/")
+                    elapsed, frames = asyncio.run(
+                        run_load(args.port, args.clients, args.turns)
+                    )
+                finally:
+                    stop_process(server)
+            total_turns = args.clients * args.turns
+            print(
+                f"{workers:>8} {total_turns / elapsed:>10.1f} "
+                f"{frames / elapsed:>12.0f} {elapsed:>10.2f}"
+            )
+    finally:
+        stop_process(fake)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Бенчмарк кодировок кадров стриминга: байты «на проводе» и CPU на сессию.
+
+Сравниваются JSON (текстовые кадры) и MessagePack (бинарные кадры), без сжатия
+и с permessage-deflate при разных размерах окна и уровнях памяти zlib.
+Сжатие моделируется так же, как его выполняет wsproto (используется hypercorn):
+raw deflate с Z_SYNC_FLUSH на каждое сообщение и отбрасыванием хвоста 00 00 ff ff.
+
+Запуск:
+    python -m benchmarks.ws_encoding --sessions 50
+"""
+
+import argparse
+import random
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.protocol import (
+    ENCODINGS,
+    FRAME_DELTA,
+    FRAME_DONE,
+    FRAME_START,
+    FRAME_TOOL,
+    TOOL_FINISHED,
+    TOOL_STARTED,
+    encode_frame,
+    make_frame,
+    new_message_id,
+)
+
+SAMPLE_TEXT = (
+    "## Погода 🌤️\n\n"
+    "- **Москва**: облачно, температура 12°C\n"
+    "- **Санкт-Петербург**: дождь, температура 9°C\n\n"
+    "## Курс доллара 💵\n\n"
+    "Текущий курс USD к RUB составляет примерно 92.5 ₽.\n\n"
+    "```python\nprint('Hello, World!')\n```\n\n"
+)
+
+# (название, window bits, mem level, сохранять контекст между сообщениями)
+DEFLATE_MODES: List[Tuple[str, int, int, bool]] = [
+    ("deflate-w15-m8", 15, 8, True),
+    ("deflate-w12-m5", 12, 5, True),
+    ("deflate-w9-m1", 9, 1, True),
+    ("deflate-no-context", 15, 8, False),
+]
+
+
+def build_session_frames(answer_chars: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    Формирует последовательность кадров типичной сессии с вызовом инструментов.
+
+    :param answer_chars: Примерная длина ответа ассистента в символах.
+    :param seed: Зерно генератора случайных чисел для размера чанков.
+    :return: Список кадров протокола.
+    """
+    rng = random.Random(seed)
+    text = (SAMPLE_TEXT * (answer_chars // len(SAMPLE_TEXT) + 1))[:answer_chars]
+    frames: List[Dict[str, Any]] = []
+
+    first_id = new_message_id()
+    frames.append(make_frame(FRAME_START, first_id))
+    frames.append(make_frame(FRAME_DONE, first_id, tool_calls=True))
+    for _ in range(3):
+        call_id = f"call_{new_message_id()[:24]}"
+        for status in (TOOL_STARTED, TOOL_FINISHED):
+            frames.append(
+                make_frame(FRAME_TOOL, call_id, name="get_weather", status=status)
+            )
+
+    message_id = new_message_id()
+    frames.append(make_frame(FRAME_START, message_id))
+    position, seq = 0, 0
+    while position < len(text):
+        size = rng.randint(1, 8)
+        frames.append(
+            make_frame(
+                FRAME_DELTA, message_id, seq=seq, delta=text[position : position + size]
+            )
+        )
+        position += size
+        seq += 1
+    frames.append(make_frame(FRAME_DONE, message_id, tool_calls=False))
+    return frames
+
+
+def ws_header_size(payload_size: int) -> int:
+    """
+    Возвращает размер заголовка серверного WebSocket-кадра (без маски).
+
+    :param payload_size: Размер полезной нагрузки в байтах.
+    :return: Размер заголовка в байтах.
+    """
+    if payload_size < 126:
+        return 2
+    if payload_size < 65536:
+        return 4
+    return 10
+
+
+def make_deflater(
+    wbits: int, mem_level: int, context_takeover: bool
+) -> Callable[[bytes], bytes]:
+    """
+    Создает функцию сжатия сообщений в стиле permessage-deflate.
+
+    :param wbits: Размер окна (log2).
+    :param mem_level: Уровень памяти zlib (1-9).
+    :param context_takeover: Сохранять ли словарь между сообщениями.
+    :return: Функция, сжимающая одно сообщение.
+    """
+    compressor: Optional[Any] = None
+
+    def deflate(data: bytes) -> bytes:
+        nonlocal compressor
+        if compressor is None or not context_takeover:
+            compressor = zlib.compressobj(
+                zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -wbits, mem_level
+            )
+        out = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        return out[:-4] if out.endswith(b"\x00\x00\xff\xff") else out
+
+    return deflate
+
+
+def run_session(
+    frames: List[Dict[str, Any]],
+    encoding: str,
+    deflate: Optional[Callable[[bytes], bytes]],
+) -> int:
+    """
+    Кодирует (и при необходимости сжимает) кадры одной сессии.
+
+    :param frames: Кадры сессии.
+    :param encoding: Кодировка кадров.
+    :param deflate: Функция сжатия или None.
+    :return: Число байт на проводе, включая заголовки WebSocket-кадров.
+    """
+    total = 0
+    for frame in frames:
+        data = encode_frame(frame, encoding)
+        payload = data.encode("utf-8") if isinstance(data, str) else data
+        if deflate is not None:
+            payload = deflate(payload)
+        total += ws_header_size(len(payload)) + len(payload)
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--answer-chars", type=int, default=4000)
+    args = parser.parse_args()
+
+    sessions = [
+        build_session_frames(args.answer_chars, seed) for seed in range(args.sessions)
+    ]
+    modes: List[Tuple[str, Optional[Tuple[int, int, bool]]]] = [("plain", None)]
+    modes += [(name, (wbits, mem, ctx)) for name, wbits, mem, ctx in DEFLATE_MODES]
+
+    print(f"{'кодировка':<10} {'сжатие':<20} {'байт/сессия':>12} {'CPU мс/сессия':>14}")
+    for encoding in ENCODINGS:
+        for mode_name, deflate_params in modes:
+            total_bytes = 0
+            started = time.process_time()
+            for frames in sessions:
+                deflate = make_deflater(*deflate_params) if deflate_params else None
+                total_bytes += run_session(frames, encoding, deflate)
+            cpu_ms = (time.process_time() - started) * 1000 / len(sessions)
+            print(
+                f"{encoding:<10} {mode_name:<20} "
+                f"{total_bytes // len(sessions):>12} {cpu_ms:>14.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+"""
+Конфигурация hypercorn для запуска в несколько процессов.
+
+Число воркеров задаётся переменной окружения WORKERS (по умолчанию 1),
+класс воркера - WORKER_CLASS (по умолчанию uvloop).
+"""
+
+import os
+
+bind = [os.getenv("BIND", "0.0.0.0:8000")]
+workers = int(os.getenv("WORKERS", "1"))
+worker_class = os.getenv("WORKER_CLASS", "uvloop")
+# Ping на уровне протокола WebSocket поддерживает соединения через NAT и прокси
+websocket_ping_interval = float(os.getenv("WEBSOCKET_PING_INTERVAL", "20"))
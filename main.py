@@ -1,7 +1,32 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
+from app.chat_integration import close_openai_client, get_openai_client
+from app.config import get_settings
 from app.routes import router
+from app.routing import get_model_router
+from app.shared_store import get_store
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Загружает настройки и создает клиентов при старте воркера (после fork),
+    а при остановке закрывает их.
+    """
+    settings = get_settings()
+    settings.validate()
+    app.state.settings = settings
+    get_model_router()
+    get_openai_client()
+    if settings.shared_store_path:
+        get_store().purge_expired()
+    yield
+    await close_openai_client()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 app.include_router(router)
@@ -1,6 +1,16 @@
+import sqlite3
+
 import pytest
 import requests
-from app.api_clients import get_dollar_rate, get_weather, get_weekly_news
+from app import api_clients
+from app.shared_store import MemoryStore
+from app.api_clients import (
+    get_dollar_rate,
+    get_weather,
+    get_weather_batch,
+    get_weekly_news,
+    get_weekly_news_batch,
+)
 
 
 class DummyResponse:
@@ -32,6 +42,14 @@ class DummyResponse:
             raise requests.HTTPError(f"HTTP Error: status code:{self.status_code}")
 
 
+@pytest.fixture(autouse=True)
+def fresh_tool_cache(monkeypatch):
+    # Каждый тест получает пустой кэш результатов инструментов.
+    store = MemoryStore()
+    monkeypatch.setattr(api_clients, "get_store", lambda: store)
+    yield
+
+
 def test_get_dollar_rate(monkeypatch):
     """
     Тестирует функцию get_dollar_rate.
@@ -49,6 +67,7 @@ def test_get_dollar_rate(monkeypatch):
     result = get_dollar_rate()
     assert "Курсы:" in result, "Сообщение должно содержать текст 'Курсы:'"
     assert "70" in result, "Должен присутствовать курс RUB 70"
+    assert result.splitlines()[0] == "Курс доллара: 1 USD = 70 RUB"
 
 
 def test_get_weather(monkeypatch):
@@ -113,5 +132,126 @@ def test_get_dollar_rate_error(monkeypatch):
     ), "Функция должна вернуть сообщение об ошибке при неверном статусе"
 
 
+class DummySession:
+    """
+    Имитирует пул HTTP-соединений и запоминает параметры запросов.
+    """
+
+    def __init__(self, responder):
+        self.responder = responder
+        self.calls = []
+
+    def get(self, url, params=None):
+        self.calls.append(params["q"])
+        return DummyResponse(self.responder(params["q"]))
+
+
+def test_get_weather_batch(monkeypatch):
+    """
+    Тестирует пакетное получение погоды.
+
+    Повторяющиеся города должны запрашиваться один раз, а результат -
+    содержать по строке на каждый уникальный город в исходном порядке.
+    """
+    session = DummySession(
+        lambda city: {"weather": [{"description": "ясно"}], "main": {"temp": len(city)}}
+    )
+    monkeypatch.setattr(api_clients, "get_http_session", lambda: session)
+
+    result = get_weather_batch(["Moscow", "Paris", " moscow "])
+
+    assert sorted(session.calls) == ["Moscow", "Paris"]
+    assert result.splitlines() == [
+        "Погода в Moscow: ясно, температура 6°C",
+        "Погода в Paris: ясно, температура 5°C",
+    ]
+
+
+def test_get_weather_batch_names_failed_location(monkeypatch):
+    """
+    Тестирует, что ошибка по одному городу в пакете не мешает остальным
+    и в строке ошибки указан город.
+    """
+
+    def responder(city):
+        if city == "Atlantis":
+            raise requests.ConnectionError("нет соединения")
+        return {"weather": [{"description": "ясно"}], "main": {"temp": 20}}
+
+    session = DummySession(responder)
+    monkeypatch.setattr(api_clients, "get_http_session", lambda: session)
+
+    result = get_weather_batch(["Moscow", "Atlantis"])
+
+    assert result.splitlines() == [
+        "Погода в Moscow: ясно, температура 20°C",
+        "Ошибка получения данных о погоде в Atlantis.",
+    ]
+
+
+def test_get_weekly_news_batch(monkeypatch):
+    """
+    Тестирует пакетное получение новостей.
+
+    Заголовок, найденный по нескольким темам, выводится только для первой темы.
+    """
+    articles = {
+        "Python": [{"title": "Python 4"}, {"title": "AI news"}],
+        "AI": [{"title": "AI news"}, {"title": "GPT-5"}],
+    }
+    session = DummySession(lambda query: {"articles": articles[query]})
+    monkeypatch.setattr(api_clients, "get_http_session", lambda: session)
+
+    result = get_weekly_news_batch(["Python", "AI", "python"])
+
+    assert sorted(session.calls) == ["AI", "Python"]
+    assert result.splitlines() == ["Python: Python 4; AI news", "AI: GPT-5"]
+
+
+def test_tool_results_cached(monkeypatch):
+    """
+    Тестирует, что успешный результат инструмента берётся из кэша,
+    а ошибки не кэшируются.
+    """
+    calls = []
+
+    def dummy_get(url, params):
+        calls.append(params["q"])
+        if len(calls) == 1:
+            return DummyResponse({}, status_code=500)
+        return DummyResponse(
+            {"weather": [{"description": "ясно"}], "main": {"temp": 20}}
+        )
+
+    monkeypatch.setattr(requests, "get", dummy_get)
+    assert get_weather("Moscow") == "Ошибка получения данных о погоде в Moscow."
+    first = get_weather("Moscow")
+    assert get_weather(" moscow") == first
+    assert len(calls) == 2
+
+
+def test_tool_cache_errors_ignored(monkeypatch):
+    """
+    Тестирует, что ошибки хранилища кэша не ломают инструмент
+    и не превращают успешный ответ в ошибку.
+    """
+
+    class LockedStore:
+        def get(self, namespace, key):
+            raise sqlite3.OperationalError("database is locked")
+
+        def set(self, namespace, key, value, ttl=None):
+            raise sqlite3.OperationalError("database is locked")
+
+    def dummy_get(url, params):
+        return DummyResponse(
+            {"weather": [{"description": "ясно"}], "main": {"temp": 20}}
+        )
+
+    monkeypatch.setattr(api_clients, "get_store", lambda: LockedStore())
+    monkeypatch.setattr(requests, "get", dummy_get)
+    assert get_weather("Moscow") == "Погода в Moscow: ясно, температура 20°C"
+
+
 if __name__ == "__main__":
     pytest.main()
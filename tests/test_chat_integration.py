@@ -1,4 +1,6 @@
 import json
+from types import SimpleNamespace
+
 import pytest
 from app import chat_integration
 from openai.types.chat.chat_completion_message import ChatCompletionMessage
@@ -8,9 +10,13 @@ from openai.types.chat.chat_completion_message_tool_call import (
 )
 
 from app.chat_integration import (
+    build_request,
+    prefix_fingerprint,
     process_tool_calls,
     create_stream_message,
+    create_templated_message,
 )
+from app.metrics import RouteStats, UsageStats
 
 
 class DummyChoice:
@@ -31,6 +37,17 @@ class DummyStreamChunk:
         self.choices = [DummyChoice(delta=delta)]
 
 
+class DummyUsageChunk:
+    def __init__(self, prompt_tokens, cached_tokens, completion_tokens):
+        # Имитация последнего чанка стрима, содержащего только usage.
+        self.choices = []
+        self.usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens),
+        )
+
+
 class DummyToolCallFunction:
     def __init__(self, name, arguments):
         self.name = name
@@ -86,11 +103,15 @@ async def test_process_tool_calls(monkeypatch):
     dummy_conn_manager = DummyConnectionManager()
 
     monkeypatch.setattr(
-        chat_integration, "get_weather", lambda loc: f"Weather for {loc}"
+        chat_integration,
+        "get_weather_batch",
+        lambda locations: "\n".join(f"Weather for {loc}" for loc in locations),
     )
     monkeypatch.setattr(chat_integration, "get_dollar_rate", lambda: "Dollar rate")
     monkeypatch.setattr(
-        chat_integration, "get_weekly_news", lambda query: f"News about {query}"
+        chat_integration,
+        "get_weekly_news_batch",
+        lambda queries: "\n".join(f"News about {query}" for query in queries),
     )
 
     responses = await process_tool_calls(
@@ -107,6 +128,50 @@ async def test_process_tool_calls(monkeypatch):
     # Проверяем, что менеджер соединений получил два сообщения (например, уведомление и ответ)
     assert len(dummy_conn_manager.messages) == 2
 
+    # Проверяем, что клиенту отправлены статусы выполнения инструмента
+    frames = [json.loads(text) for text in dummy_websocket.sent_texts]
+    assert [frame["status"] for frame in frames] == ["started", "finished"]
+    assert all(frame["type"] == "tool" and frame["id"] == "2" for frame in frames)
+
+
+@pytest.mark.asyncio
+async def test_process_tool_calls_empty_arguments(monkeypatch):
+    """
+    Тестирует, что пустые списки аргументов передаются пакетным функциям как есть,
+    а не превращаются в запрос для города или темы "None".
+    """
+    received = []
+
+    def record(name):
+        def batch(items):
+            received.append((name, items))
+            return f"{name}: {items}"
+
+        return batch
+
+    monkeypatch.setattr(chat_integration, "get_weather_batch", record("weather"))
+    monkeypatch.setattr(chat_integration, "get_weekly_news_batch", record("news"))
+    message_obj = ChatCompletionMessage(
+        role="assistant",
+        content="",
+        tool_calls=[
+            ChatCompletionMessageToolCall(
+                function=Function(name="get_weather", arguments='{"locations": []}'),
+                id="1",
+                type="function",
+            ),
+            ChatCompletionMessageToolCall(
+                function=Function(name="get_weekly_news", arguments="{}"),
+                id="2",
+                type="function",
+            ),
+        ],
+    )
+
+    await process_tool_calls(message_obj, DummyWebsocket(), DummyConnectionManager())
+
+    assert sorted(received) == [("news", []), ("weather", [])]
+
 
 @pytest.mark.asyncio
 async def test_create_stream_message(monkeypatch):
@@ -116,11 +181,17 @@ async def test_create_stream_message(monkeypatch):
     Используя monkeypatch, подменяет метод create, чтобы имитировать передачу данных по частям,
     и проверяет, что итоговое сообщение и отправленные через websocket чанки корректно агрегируются.
     """
+    # Первый чанк содержит только роль и пустой текст - кадр для него не отправляется
+    role_delta = DummyDelta(content="", tool_calls=[])
     chunk1_delta = DummyDelta(content="Hello, ", tool_calls=[])
     chunk2_delta = DummyDelta(content="World!", tool_calls=[])
-    dummy_chunks = [DummyStreamChunk(chunk1_delta), DummyStreamChunk(chunk2_delta)]
+    dummy_chunks = [
+        DummyStreamChunk(role_delta),
+        DummyStreamChunk(chunk1_delta),
+        DummyStreamChunk(chunk2_delta),
+    ]
 
-    async def dummy_create(*, model, messages, tools, stream):
+    async def dummy_create(*, model, messages, tools, stream, stream_options):
         async def inner():
             for chunk in dummy_chunks:
                 yield chunk
@@ -128,7 +199,7 @@ async def test_create_stream_message(monkeypatch):
         return inner()
 
     monkeypatch.setattr(
-        chat_integration.openai.chat.completions, "create", dummy_create
+        chat_integration.get_openai_client().chat.completions, "create", dummy_create
     )
 
     dummy_websocket = DummyWebsocket()
@@ -137,5 +208,106 @@ async def test_create_stream_message(monkeypatch):
 
     # Проверяем, что итоговый контент собран из всех чанков
     assert result_message.content == "Hello, World!"
-    # Проверяем, что отправленные через websocket тексты соответствуют содержимому чанков
-    assert dummy_websocket.sent_texts == ["Hello, ", "World!"]
+    # Проверяем, что через websocket отправлены кадры start, delta и done
+    frames = [json.loads(text) for text in dummy_websocket.sent_texts]
+    assert [frame["type"] for frame in frames] == ["start", "delta", "delta", "done"]
+    assert len({frame["id"] for frame in frames}) == 1
+    assert [frame["delta"] for frame in frames[1:3]] == ["Hello, ", "World!"]
+    assert [frame["seq"] for frame in frames[1:3]] == [0, 1]
+    assert frames[-1]["tool_calls"] is False
+
+
+def test_build_request_stable_prefix():
+    """
+    Тестирует, что префикс запроса (системное сообщение и инструменты) не меняется
+    между запросами с разной историей, а его отпечаток считается по переданным объектам.
+    """
+    system = {"role": "system", "content": "system"}
+    first = build_request([system, {"role": "user", "content": "Привет"}], "gpt-4o")
+    second = build_request(
+        [system, {"role": "user", "content": "Привет"}, {"role": "user", "content": "!"}],
+        "gpt-4o-mini",
+    )
+
+    assert first["tools"] is second["tools"]
+    assert json.dumps(first["tools"]) == json.dumps(second["tools"])
+    assert first["messages"][0] is second["messages"][0]
+    assert first["stream_options"] == {"include_usage": True}
+    assert prefix_fingerprint(first) == prefix_fingerprint(second)
+
+    changed = build_request([{"role": "system", "content": "другой"}], "gpt-4o")
+    assert prefix_fingerprint(changed) != prefix_fingerprint(first)
+
+
+@pytest.mark.asyncio
+async def test_create_stream_message_records_usage(monkeypatch):
+    """
+    Тестирует учёт кэшированных токенов из последнего чанка стрима с usage.
+    """
+    dummy_chunks = [
+        DummyStreamChunk(DummyDelta(content="Hi")),
+        DummyUsageChunk(prompt_tokens=1200, cached_tokens=1024, completion_tokens=5),
+    ]
+
+    async def dummy_create(**kwargs):
+        async def inner():
+            for chunk in dummy_chunks:
+                yield chunk
+
+        return inner()
+
+    stats = UsageStats()
+    routes = RouteStats()
+    monkeypatch.setattr(chat_integration, "usage_stats", stats)
+    monkeypatch.setattr(chat_integration, "route_stats", routes)
+    monkeypatch.setattr(
+        chat_integration.get_openai_client().chat.completions, "create", dummy_create
+    )
+
+    result_message = await create_stream_message([], DummyWebsocket())
+
+    assert result_message.content == "Hi"
+    snapshot = stats.snapshot()
+    assert snapshot["requests"] == 1
+    assert snapshot["cached_tokens"] == 1024
+    assert snapshot["cache_hit_ratio"] == pytest.approx(1024 / 1200)
+
+    route = routes.snapshot()["dispatch"]
+    assert route["calls"] == 1
+    assert route["prompt_tokens"] == 1200
+    assert route["avg_first_token_latency"] is not None
+
+
+@pytest.mark.asyncio
+async def test_create_templated_message(monkeypatch):
+    """
+    Тестирует шаблонный ответ из результатов инструментов без вызова модели:
+    для курса доллара пользователю отправляется только курс USD к RUB.
+    """
+    routes = RouteStats()
+    monkeypatch.setattr(chat_integration, "route_stats", routes)
+    dummy_websocket = DummyWebsocket()
+    tool_calls = [
+        ChatCompletionMessageToolCall(
+            function=Function(name="get_dollar_rate", arguments="{}"),
+            id="1",
+            type="function",
+        )
+    ]
+    tool_responses = [
+        {
+            "role": "tool",
+            "tool_call_id": "1",
+            "content": "Курс доллара: 1 USD = 81.5 RUB\n"
+            "Курсы: {'USD': 1, 'AED': 3.67, 'RUB': 81.5}",
+        },
+    ]
+
+    result_message = await create_templated_message(
+        tool_calls, tool_responses, dummy_websocket
+    )
+
+    assert result_message.content == "💵 Курс доллара: 1 USD = 81.5 RUB"
+    frames = [json.loads(text) for text in dummy_websocket.sent_texts]
+    assert [frame["type"] for frame in frames] == ["start", "delta", "done"]
+    assert routes.snapshot()["template"]["calls"] == 1
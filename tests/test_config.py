@@ -0,0 +1,36 @@
+import pytest
+
+from app.config import Settings
+
+
+def test_settings_from_env():
+    """
+    Тестирует создание настроек из переменных окружения с приведением типов.
+    """
+    settings = Settings.from_env(
+        {
+            "DOLLAR_API_KEY": "dollar",
+            "OPENAI_API_KEY": "openai",
+            "LONG_HISTORY_THRESHOLD": "10",
+            "TEMPLATED_TOOLS": "get_dollar_rate, get_weather",
+            "HEARTBEAT_INTERVAL": "5",
+        }
+    )
+    assert settings.openai_api_key == "openai"
+    assert settings.long_history_threshold == 10
+    assert settings.templated_tools == ("get_dollar_rate", "get_weather")
+    assert settings.heartbeat_interval == 5.0
+    assert settings.dispatch_model == "gpt-4o"
+    assert "/dollar/" in settings.dollar_api_url
+
+
+def test_settings_validate():
+    """
+    Тестирует, что проверка настроек требует все API ключи.
+    """
+    with pytest.raises(ValueError):
+        Settings(openai_api_key="openai").validate()
+
+    Settings(
+        dollar_api_key="d", weather_api_key="w", news_api_key="n", openai_api_key="o"
+    ).validate()
@@ -1,5 +1,12 @@
+import asyncio
+import json
+import sqlite3
+
 import pytest
-from app.connections import ConnectionManager
+from openai.types.chat.chat_completion_message import ChatCompletionMessage
+
+from app.config import Settings
+from app.connections import CLOSE_HEARTBEAT_TIMEOUT, CLOSE_IDLE, ConnectionManager
 
 
 class FakeWebSocket:
@@ -81,3 +88,230 @@ async def test_add_and_get_message():
     history = manager.get_history(fake_ws)
     assert len(history) == 2
     assert history[-1] == message
+
+
+@pytest.mark.asyncio
+async def test_add_message_normalizes_pydantic():
+    """
+    Тестирует, что pydantic-сообщения сохраняются в истории в виде словарей,
+    а системное сообщение общее для всех соединений.
+    """
+    manager = ConnectionManager()
+    first_ws, second_ws = FakeWebSocket("first"), FakeWebSocket("second")
+    await manager.connect(first_ws)
+    await manager.connect(second_ws)
+    assert manager.get_history(first_ws)[0] is manager.get_history(second_ws)[0]
+
+    manager.add_message(
+        first_ws, ChatCompletionMessage(role="assistant", content="Ответ")
+    )
+    assert manager.get_history(first_ws)[-1] == {
+        "role": "assistant",
+        "content": "Ответ",
+    }
+
+
+@pytest.mark.asyncio
+async def test_memory_budget_evicts_lru(tmp_path):
+    """
+    Тестирует вытеснение давно неактивной истории при превышении бюджета памяти
+    и её восстановление с диска при следующем обращении.
+    """
+    manager = ConnectionManager(
+        Settings(session_memory_budget=2000, session_spill_dir=str(tmp_path))
+    )
+    old_ws, new_ws = FakeWebSocket("old"), FakeWebSocket("new")
+    await manager.connect(old_ws)
+    await manager.connect(new_ws)
+    manager.add_message(old_ws, {"role": "user", "content": "старое"})
+
+    # Новое большое сообщение превышает бюджет и вытесняет историю old_ws
+    manager.add_message(new_ws, {"role": "user", "content": "x" * 1500})
+    stats = manager.stats()
+    assert stats["live_sessions"] == 2
+    assert stats["evicted_sessions"] == 1
+    assert old_ws not in manager.active_connections
+    assert len(list(tmp_path.iterdir())) == 1
+
+    # При обращении история возвращается с диска вместе с общим системным сообщением
+    history = manager.get_history(old_ws)
+    assert history[-1] == {"role": "user", "content": "старое"}
+    assert history[0] is manager.get_history(new_ws)[0]
+
+    manager.disconnect(old_ws)
+    manager.disconnect(new_ws)
+    assert manager.stats() == {
+        "live_sessions": 0,
+        "resident_sessions": 0,
+        "evicted_sessions": 0,
+        "retained_bytes": 0,
+    }
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_memory_budget_without_spill_dir():
+    """
+    Тестирует, что без каталога выгрузки вытесненная история начинается заново.
+    """
+    manager = ConnectionManager(Settings(session_memory_budget=1000))
+    old_ws, new_ws = FakeWebSocket("old"), FakeWebSocket("new")
+    await manager.connect(old_ws)
+    await manager.connect(new_ws)
+    manager.add_message(old_ws, {"role": "user", "content": "старое"})
+    manager.add_message(new_ws, {"role": "user", "content": "x" * 800})
+
+    history = manager.get_history(old_ws)
+    assert len(history) == 1
+    assert history[0]["role"] == "system"
+
+
+@pytest.mark.asyncio
+async def test_memory_budget_keeps_sessions_with_turn_in_flight():
+    """
+    Тестирует, что истории сессий с выполняющимся ходом не вытесняются:
+    сообщения обоих ходов сохраняются, даже если бюджет временно превышен.
+    """
+    manager = ConnectionManager(Settings(session_memory_budget=1500))
+    first_ws, second_ws = FakeWebSocket("first"), FakeWebSocket("second")
+    await manager.connect(first_ws)
+    await manager.connect(second_ws)
+
+    with manager.turn(first_ws), manager.turn(second_ws):
+        manager.add_message(first_ws, {"role": "user", "content": "Погода?"})
+        manager.add_message(second_ws, {"role": "user", "content": "x" * 800})
+        manager.add_message(first_ws, {"role": "assistant", "content": "Ищу"})
+        manager.add_message(first_ws, {"role": "tool", "content": "y" * 300})
+        assert manager.stats()["evicted_sessions"] == 0
+        assert [m["role"] for m in manager.get_history(first_ws)] == [
+            "system",
+            "user",
+            "assistant",
+            "tool",
+        ]
+        assert [m["role"] for m in manager.get_history(second_ws)] == [
+            "system",
+            "user",
+        ]
+
+    # После завершения ходов бюджет снова соблюдается за счёт давно неактивной сессии
+    manager.add_message(second_ws, {"role": "assistant", "content": "Готово"})
+    assert manager.stats()["evicted_sessions"] == 1
+    assert first_ws not in manager.active_connections
+
+
+class HeartbeatWebSocket(FakeWebSocket):
+    def __init__(self, incoming):
+        super().__init__()
+        self.incoming = list(incoming)
+        self.sent = []
+        self.close_code = None
+
+    async def receive_text(self):
+        # Возвращает следующее сообщение или «молчит», имитируя неактивного клиента.
+        if self.incoming:
+            return self.incoming.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+@pytest.mark.asyncio
+async def test_receive_text_skips_pong():
+    """
+    Тестирует, что pong-кадры клиента не передаются как сообщения пользователя.
+    """
+    manager = ConnectionManager()
+    ws = HeartbeatWebSocket(['{"type":"pong"}', "Привет"])
+    await manager.connect(ws)
+    assert await manager.receive_text(ws) == "Привет"
+
+
+@pytest.mark.asyncio
+async def test_receive_text_heartbeat_timeout():
+    """
+    Тестирует отправку ping-кадров и закрытие соединения без ответа клиента.
+    """
+    manager = ConnectionManager(
+        Settings(heartbeat_interval=0.01, heartbeat_timeout=0.05)
+    )
+    ws = HeartbeatWebSocket([])
+    await manager.connect(ws)
+
+    assert await manager.receive_text(ws) is None
+    assert ws.close_code == CLOSE_HEARTBEAT_TIMEOUT
+    assert ws.sent and all(frame["type"] == "ping" for frame in ws.sent)
+
+
+@pytest.mark.asyncio
+async def test_receive_text_idle_timeout():
+    """
+    Тестирует закрытие сессии по простою, даже если клиент отвечает на ping.
+    """
+    manager = ConnectionManager(
+        Settings(heartbeat_interval=0.01, heartbeat_timeout=10, idle_timeout=0.03)
+    )
+    ws = HeartbeatWebSocket(['{"type":"pong"}'] * 3)
+    await manager.connect(ws)
+
+    assert await manager.receive_text(ws) is None
+    assert ws.close_code == CLOSE_IDLE
+
+
+@pytest.mark.asyncio
+async def test_session_resumed_from_shared_store(tmp_path):
+    """
+    Тестирует продолжение сессии после обрыва соединения через общее хранилище:
+    история, сохранённая после хода одним менеджером (воркером), восстанавливается
+    другим ещё до того, как первый заметит обрыв, а позднее отключение на первом
+    воркере не перезаписывает продолженную историю.
+    """
+    settings = Settings(shared_store_path=str(tmp_path / "shared.db"))
+    first_worker = ConnectionManager(settings)
+    second_worker = ConnectionManager(settings)
+
+    ws = FakeWebSocket()
+    await first_worker.connect(ws, "session-123")
+    first_worker.add_message(ws, {"role": "user", "content": "Привет"})
+    await first_worker.save_session(ws)
+
+    new_ws = FakeWebSocket()
+    await second_worker.connect(new_ws, "session-123")
+    history = second_worker.get_history(new_ws)
+    assert [message["role"] for message in history] == ["system", "user"]
+    assert history[-1]["content"] == "Привет"
+
+    second_worker.add_message(new_ws, {"role": "user", "content": "Ещё"})
+    await second_worker.save_session(new_ws)
+    first_worker.disconnect(ws)
+
+    stored = second_worker.store.get("session", "session-123")
+    assert [message["content"] for message in stored[1:]] == ["Привет", "Ещё"]
+
+
+@pytest.mark.asyncio
+async def test_connect_survives_store_errors(tmp_path):
+    """
+    Тестирует, что ошибка чтения общего хранилища при подключении не разрывает
+    соединение: сессия начинается заново, а после отключения память освобождается.
+    """
+
+    class LockedStore:
+        def get(self, namespace, key):
+            raise sqlite3.OperationalError("database is locked")
+
+    manager = ConnectionManager(Settings(shared_store_path=str(tmp_path / "shared.db")))
+    manager._store = LockedStore()
+    ws = FakeWebSocket()
+
+    await manager.connect(ws, "session-123")
+    assert [message["role"] for message in manager.get_history(ws)] == ["system"]
+
+    manager.disconnect(ws)
+    assert manager.stats()["live_sessions"] == 0
+    assert manager.stats()["retained_bytes"] == 0
+    assert manager.session_ids == {}
@@ -0,0 +1,69 @@
+import json
+from types import SimpleNamespace
+
+import msgpack
+import pytest
+
+from app.protocol import encode_frame, make_frame, new_message_id, send_frame
+
+
+def test_make_and_encode_frame():
+    """
+    Тестирует формирование и сериализацию кадра потокового протокола.
+
+    Проверяется, что кадр содержит тип, идентификатор и дополнительные поля,
+    а кириллица не экранируется при сериализации.
+    """
+    frame = make_frame("delta", "abc", seq=3, delta="Привет")
+    assert frame == {"type": "delta", "id": "abc", "seq": 3, "delta": "Привет"}
+
+    encoded = encode_frame(frame)
+    assert "Привет" in encoded
+    assert json.loads(encoded) == frame
+
+
+def test_new_message_id_unique():
+    """
+    Тестирует, что идентификаторы сообщений уникальны.
+    """
+    assert new_message_id() != new_message_id()
+
+
+def test_encode_frame_msgpack():
+    """
+    Тестирует сериализацию кадра в MessagePack.
+    """
+    frame = make_frame("done", "abc", tool_calls=False)
+    encoded = encode_frame(frame, "msgpack")
+    assert isinstance(encoded, bytes)
+    assert msgpack.unpackb(encoded) == frame
+
+
+@pytest.mark.asyncio
+async def test_send_frame_uses_connection_encoding():
+    """
+    Тестирует выбор типа WebSocket-сообщения по кодировке соединения.
+
+    Для msgpack кадр отправляется бинарным сообщением, по умолчанию - текстовым.
+    """
+
+    class DummyWebsocket:
+        def __init__(self, encoding=None):
+            self.state = SimpleNamespace()
+            if encoding is not None:
+                self.state.frame_encoding = encoding
+            self.sent = []
+
+        async def send_text(self, text):
+            self.sent.append(text)
+
+        async def send_bytes(self, data):
+            self.sent.append(data)
+
+    text_ws = DummyWebsocket()
+    await send_frame(text_ws, "start", "abc")
+    assert json.loads(text_ws.sent[0]) == {"type": "start", "id": "abc"}
+
+    binary_ws = DummyWebsocket("msgpack")
+    await send_frame(binary_ws, "start", "abc")
+    assert msgpack.unpackb(binary_ws.sent[0]) == {"type": "start", "id": "abc"}
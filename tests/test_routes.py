@@ -1,7 +1,7 @@
 import pytest
 from fastapi.testclient import TestClient
 from starlette.websockets import WebSocketDisconnect
-from app.routes import manager
+from app.routes import SESSION_ID_PATTERN, http_manager, manager
 from main import app
 
 client = TestClient(app)
@@ -15,7 +15,7 @@ class DummyAssistantMessage:
 
 @pytest.fixture(autouse=True)
 def patch_create_stream_message(monkeypatch):
-    async def dummy_create_stream_message(history, websocket):
+    async def dummy_create_stream_message(history, websocket, route="dispatch"):
         # Имитация создания потокового сообщения, возвращающего тестовый ответ ассистента.
         return DummyAssistantMessage("dummy response")
 
@@ -82,9 +82,84 @@ def test_get_index_failure(monkeypatch):
     assert "Ошибка загрузки страницы" in response.text
 
 
+def test_get_metrics():
+    response = client.get("/api/metrics/")
+    assert response.status_code == 200
+    assert "cached_tokens" in response.json()["usage"]
+
+
+def test_chat_stream_sse():
+    live_before = manager.stats()["live_sessions"]
+    http_live_before = http_manager.stats()["live_sessions"]
+    response = client.post(
+        "/api/chat/stream/",
+        json={"messages": [{"role": "user", "content": "Привет"}]},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert 'event: end\ndata: {"content": "dummy response"}' in response.text
+    # История HTTP-диалога хранится отдельно от WebSocket-сессий и освобождается после ответа
+    assert manager.stats()["live_sessions"] == live_before
+    assert http_manager.stats()["live_sessions"] == http_live_before
+
+
+def test_chat_stream_rejects_assistant_last():
+    response = client.post(
+        "/api/chat/stream/",
+        json={
+            "messages": [
+                {"role": "user", "content": "Привет"},
+                {"role": "assistant", "content": "Здравствуйте!"},
+            ]
+        },
+    )
+    assert response.status_code == 422
+
+
+def test_chat_batch_uses_http_manager(monkeypatch):
+    seen = []
+
+    async def recording_create_stream_message(history, websocket, route="dispatch"):
+        # Запоминаем, в каком менеджере хранится история промпта.
+        seen.append(
+            (websocket in http_manager.active_connections, websocket in manager.busy)
+        )
+        return DummyAssistantMessage("ok")
+
+    monkeypatch.setattr(
+        "app.routes.create_stream_message", recording_create_stream_message
+    )
+    response = client.post("/api/chat/batch/", json={"prompts": ["а", "б"]})
+    assert response.status_code == 200
+    assert seen == [(True, False), (True, False)]
+
+
+def test_chat_batch(monkeypatch):
+    async def flaky_create_stream_message(history, websocket, route="dispatch"):
+        # Имитация ошибки модели для одного из промптов пакета.
+        if history[-1]["content"] == "сломайся":
+            raise RuntimeError("upstream error")
+        return DummyAssistantMessage(f"ответ на {history[-1]['content']}")
+
+    monkeypatch.setattr("app.routes.create_stream_message", flaky_create_stream_message)
+    response = client.post(
+        "/api/chat/batch/",
+        json={"prompts": ["первый", "сломайся", "третий"], "concurrency": 2},
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [item["content"] for item in results] == [
+        "ответ на первый",
+        None,
+        "ответ на третий",
+    ]
+    assert results[1]["error"] == "upstream error"
+    assert all(item["latency"] >= 0 for item in results)
+
+
 def test_websocket_disconnect(monkeypatch):
     # Подменяем методы подключения и отключения менеджера соединений для контроля поведения.
-    async def dummy_connect(ws):
+    async def dummy_connect(ws, session_id=None):
         pass
 
     monkeypatch.setattr(manager, "connect", dummy_connect)
@@ -99,3 +174,30 @@ def test_websocket_disconnect(monkeypatch):
         with client.websocket_connect("/api/chat/") as websocket:
             websocket.send_text("Hello WebSocket")
             websocket.close()
+
+
+def test_websocket_error_frees_history(monkeypatch):
+    async def failing_create_stream_message(history, websocket, route="dispatch"):
+        # Имитация ошибки модели во время хода диалога.
+        raise RuntimeError("upstream error")
+
+    monkeypatch.setattr(
+        "app.routes.create_stream_message", failing_create_stream_message
+    )
+
+    # Сервер закрывает соединение после ошибки, а история освобождается
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/api/chat/") as websocket:
+            websocket.send_text("Hello WebSocket")
+            websocket.receive_text()
+
+    stats = manager.stats()
+    assert stats["live_sessions"] == 0
+    assert stats["retained_bytes"] == 0
+
+
+def test_session_id_pattern():
+    # Короткие (угадываемые) идентификаторы сессий не принимаются
+    assert SESSION_ID_PATTERN.fullmatch("0123456789abcdef" * 2)
+    assert not SESSION_ID_PATTERN.fullmatch("session1")
+    assert not SESSION_ID_PATTERN.fullmatch("0123456789abcdef" * 2 + "!")
@@ -0,0 +1,56 @@
+import pytest
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall,
+    Function,
+)
+
+from app.routing import ROUTE_ANSWER, ROUTE_DISPATCH, ModelRouter
+
+
+def make_tool_call(name):
+    return ChatCompletionMessageToolCall(
+        function=Function(name=name, arguments="{}"), id=name, type="function"
+    )
+
+
+def test_select_model_by_route():
+    """
+    Тестирует выбор модели по маршруту вызова.
+    """
+    router = ModelRouter("gpt-4o-mini", "gpt-4o")
+    history = [{"role": "user", "content": "Привет"}]
+    assert router.select_model(ROUTE_DISPATCH, history) == "gpt-4o-mini"
+    assert router.select_model(ROUTE_ANSWER, history) == "gpt-4o"
+
+
+def test_select_model_by_history_length():
+    """
+    Тестирует переключение на отдельную модель для длинной истории.
+    """
+    router = ModelRouter("gpt-4o-mini", "gpt-4o", "o3-mini", long_history_threshold=3)
+    assert router.select_model(ROUTE_DISPATCH, [{}] * 2) == "gpt-4o-mini"
+    assert router.select_model(ROUTE_DISPATCH, [{}] * 3) == "o3-mini"
+    assert router.select_model(ROUTE_ANSWER, [{}] * 3) == "o3-mini"
+
+
+def test_can_template():
+    """
+    Тестирует, что шаблонный ответ допускается, только если все инструменты в списке.
+    """
+    router = ModelRouter("gpt-4o", "gpt-4o", templated_tools=["get_dollar_rate"])
+    assert router.can_template([make_tool_call("get_dollar_rate")]) is True
+    assert (
+        router.can_template(
+            [make_tool_call("get_dollar_rate"), make_tool_call("get_weather")]
+        )
+        is False
+    )
+    assert router.can_template([]) is False
+
+
+def test_templated_tools_require_template():
+    """
+    Тестирует, что шаблонный ответ нельзя включить для инструмента без шаблона.
+    """
+    with pytest.raises(ValueError):
+        ModelRouter("gpt-4o", "gpt-4o", templated_tools=["get_stock_price"])
@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from app import shared_store
+from app.shared_store import MemoryStore, SQLiteStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStore()
+    return SQLiteStore(str(tmp_path / "store.db"))
+
+
+def test_set_get_delete(store):
+    """
+    Тестирует базовые операции хранилища.
+    """
+    assert store.get("weather", "moscow") is None
+    store.set("weather", "moscow", ["ясно", 20])
+    assert store.get("weather", "moscow") == ["ясно", 20]
+    assert store.get("news", "moscow") is None
+    store.delete("weather", "moscow")
+    assert store.get("weather", "moscow") is None
+
+
+def test_ttl_expiry(store):
+    """
+    Тестирует, что значения с истёкшим сроком жизни не возвращаются.
+    """
+    store.set("weather", "moscow", "ясно", ttl=0.01)
+    time.sleep(0.02)
+    assert store.get("weather", "moscow") is None
+
+
+def test_expired_purged_on_write(store, monkeypatch):
+    """
+    Тестирует удаление записей с истёкшим сроком: явное и попутно при записи.
+    """
+    store.set("weather", "moscow", "ясно", ttl=0.01)
+    time.sleep(0.02)
+    assert store.purge_expired() == 1
+
+    store.set("weather", "paris", "дождь", ttl=0.01)
+    time.sleep(0.02)
+    monkeypatch.setattr(shared_store, "PURGE_INTERVAL", 0)
+    store.set("session", "abc", [])
+    assert store.purge_expired() == 0
+    assert store.get("session", "abc") == []
+
+
+def test_sqlite_shared_between_instances(tmp_path):
+    """
+    Тестирует, что данные SQLite-хранилища видны другим экземплярам (воркерам).
+    """
+    path = str(tmp_path / "store.db")
+    SQLiteStore(path).set("session", "abc", [{"role": "user", "content": "Привет"}])
+    assert SQLiteStore(path).get("session", "abc") == [
+        {"role": "user", "content": "Привет"}
+    ]